@@ -114,16 +114,27 @@ const print_letters = async () => {
   }
 };
 
+const swap_photo = (img) => {
+  // swap the image, and the variants of its picture, with the alternate ones
+  // stored in the data-alternate attributes
+  const sources = img.parentElement.querySelectorAll("source");
+  sources.forEach((source) => {
+    [source.srcset, source.dataset.alternate] = [
+      source.dataset.alternate,
+      source.srcset,
+    ];
+  });
+  [img.src, img.dataset.alternate] = [img.dataset.alternate, img.src];
+};
+
 const photo_mouse_enter = (e) => {
   // when the mouse enters the photo container, replace the image with the alternate one
-  // store the original image in the src attribute
-  e.target.old_src = e.target.src;
-  e.target.src = "./assets/img/photo_alternate.png";
+  swap_photo(e.target);
 };
 
 const photo_mouse_leave = (e) => {
   // when the mouse leaves the photo container, replace the image with the default one
-  e.target.src = e.target.old_src;
+  swap_photo(e.target);
 };
 
 const timeout = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
@@ -0,0 +1,98 @@
+"""Benchmark loading the repos from the JSON files and from a binary snapshot."""
+
+import argparse
+import os
+import tempfile
+import time
+
+import ujson
+from synthetic import synthetic_repos
+
+from modules.repository import Repository
+from modules.snapshot import SnapshotRepos, write_snapshot
+from modules.storage import read_repos, write_repos
+
+
+def legacy_load(path: str) -> list[Repository]:
+    """Load the repos from a legacy repos.json, as done previously.
+
+    Returns:
+        list[Repository]
+    """
+    with open(path, "r") as f:
+        data = ujson.load(f)
+        return [Repository(**repo_dict) for repo_dict in data["Repositories"]]
+
+
+def touch(repos: list[Repository]) -> None:
+    """Access the fields used by the homepage template on every repo."""
+    for repo in repos:
+        repo.name_formatted, repo.topics, repo.language, repo.created_at
+
+
+def measure(function: callable, repeat: int) -> float:
+    """Get the best time of a function over a number of runs.
+
+    Returns:
+        float: best time, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """Script entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the repos loading.")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        help="Numbers of synthetic repos",
+        default=[1_000, 10_000, 100_000],
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        help="Runs for each measure",
+        default=3,
+    )
+    arguments = parser.parse_args()
+
+    print(
+        f"{'repos':>8} {'legacy':>10} {'jsonl':>10} "
+        f"{'snapshot':>10} {'snapshot+access':>16} {'materialised':>13}"
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        legacy_path = os.path.join(folder, "repos.json")
+        jsonl_path = os.path.join(folder, "repos.jsonl")
+        snapshot_path = os.path.join(folder, "repos.snap")
+
+        for size in arguments.sizes:
+            repos = synthetic_repos(size)
+            with open(legacy_path, "w") as f:
+                ujson.dump({"Repositories": [r.as_dict for r in repos]}, f)
+            write_repos(jsonl_path, repos)
+            write_snapshot(snapshot_path, repos)
+
+            legacy = measure(lambda: legacy_load(legacy_path), arguments.repeat)
+            jsonl = measure(lambda: list(read_repos(jsonl_path)), arguments.repeat)
+            snapshot = measure(lambda: SnapshotRepos(snapshot_path), arguments.repeat)
+            accessed = measure(
+                lambda: touch(SnapshotRepos(snapshot_path)), arguments.repeat
+            )
+            materialised = measure(
+                lambda: touch(SnapshotRepos(snapshot_path).materialise()),
+                arguments.repeat,
+            )
+            print(
+                f"{size:>8} {legacy:>9.4f}s {jsonl:>9.4f}s "
+                f"{snapshot:>9.4f}s {accessed:>15.4f}s {materialised:>12.4f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
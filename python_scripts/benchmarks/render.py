@@ -0,0 +1,83 @@
+"""Benchmark the cold and warm render times of the homepage template."""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import toml
+from synthetic import synthetic_repos
+
+from modules.renderer import Renderer
+
+TEMPLATES_PATH = os.path.join(os.path.dirname(__file__), "..", "templates", "")
+
+
+def render_once(settings_path: str, data: dict) -> float:
+    """Create a new Renderer and render the homepage.
+
+    Returns:
+        float: elapsed time, in seconds.
+    """
+    start = time.perf_counter()
+    Renderer(settings_path=settings_path).renderFile("base.html", data=data)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """Script entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the homepage rendering.")
+    parser.add_argument(
+        "--repos",
+        type=int,
+        help="Number of synthetic repos",
+        default=1_000,
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        help="Runs for each measure",
+        default=5,
+    )
+    arguments = parser.parse_args()
+
+    repos = synthetic_repos(arguments.repos)
+    repos_list = {}
+    for repo in repos:
+        repos_list.setdefault(repo.language or "Other", []).append(repo)
+    data = {
+        "interactive_repos": [r for r in repos if r.is_interactive],
+        "repos_list": repos_list,
+    }
+
+    print(f"{'environment':>12} {'cold':>10} {'warm':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        settings_path = os.path.join(folder, "settings.toml")
+        cache_path = os.path.join(folder, "cache", "")
+
+        for sandboxed in (True, False):
+            with open(settings_path, "w") as f:
+                toml.dump(
+                    {
+                        "Renderer": {
+                            "templates_path": TEMPLATES_PATH,
+                            "sandboxed": sandboxed,
+                            "bytecode_cache_path": cache_path,
+                        }
+                    },
+                    f,
+                )
+
+            cold, warm = float("inf"), float("inf")
+            for _ in range(arguments.repeat):
+                shutil.rmtree(cache_path, ignore_errors=True)
+                cold = min(cold, render_once(settings_path, data))
+                warm = min(warm, render_once(settings_path, data))
+
+            name = "sandboxed" if sandboxed else "trusted"
+            print(f"{name:>12} {cold:>9.4f}s {warm:>9.4f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Benchmark the statistics engine against the previous Scraper.stats passes."""
+
+import argparse
+import time
+
+from synthetic import synthetic_repos
+
+from modules.repository import Repository
+from modules.stats import StatsEngine
+
+
+def baseline_stats(repos: list[Repository]) -> dict:
+    """Compute the totals with one pass per field, as Scraper.stats did.
+
+    Returns:
+        dict: statistics.
+    """
+    languages = {}
+    for repo in repos:
+        for language in repo.languages:
+            name = language["language"]
+            if name not in languages:
+                languages[name] = {"size": 0, "repos": 0}
+            languages[name]["size"] += language["size"]
+            languages[name]["repos"] += 1
+
+    total_size = sum(lang["size"] for lang in languages.values())
+    for language in languages.values():
+        relative_size = language["size"] / total_size
+        language["relative_size"] = relative_size
+        language["relative_size_formatted"] = f"{relative_size:.2%}"
+
+    return {
+        "languages": languages,
+        "stargazers_count": sum(r.stargazers_count for r in repos),
+        "forks_count": sum(r.forks_count for r in repos),
+        "watchers_count": sum(r.watchers_count for r in repos),
+        "open_issues_count": sum(r.open_issues_count for r in repos),
+        "commits_count": sum(r.commits_count for r in repos),
+    }
+
+
+def separate_stats(repos: list[Repository]) -> dict:
+    """Compute the totals as Scraper.stats did, then the new aggregates apart.
+
+    Returns:
+        dict: statistics.
+    """
+    stats = baseline_stats(repos)
+
+    years = {}
+    topics = {}
+    for repo in repos:
+        year = int(repo.created_at[:4])
+        totals = years.setdefault(year, [0, 0, 0])
+        totals[0] += 1
+        totals[1] += repo.commits_count
+        totals[2] += repo.stargazers_count
+
+        for topic in repo.topics:
+            totals = topics.setdefault(topic, [0, 0, 0])
+            totals[0] += 1
+            totals[1] += repo.commits_count
+            totals[2] += repo.stargazers_count
+
+    stats["years"] = years
+    stats["topics"] = topics
+    stats["stargazers"] = sorted(r.stargazers_count for r in repos)
+    return stats
+
+
+def measure(function: callable, repeat: int) -> float:
+    """Get the best time of a function over a number of runs.
+
+    Returns:
+        float: best time, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """Script entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the stats engine.")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        help="Numbers of synthetic repos",
+        default=[1_000, 10_000, 100_000],
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        help="Runs for each measure",
+        default=3,
+    )
+    arguments = parser.parse_args()
+
+    print(f"{'repos':>8} {'baseline':>10} {'separate':>10} {'engine':>10}")
+    for size in arguments.sizes:
+        repos = synthetic_repos(size)
+        baseline = measure(lambda: baseline_stats(repos), arguments.repeat)
+        separate = measure(lambda: separate_stats(repos), arguments.repeat)
+        engine = measure(lambda: StatsEngine(repos).compute(), arguments.repeat)
+        print(f"{size:>8} {baseline:>9.4f}s {separate:>9.4f}s {engine:>9.4f}s")
+
+
+if __name__ == "__main__":
+    main()
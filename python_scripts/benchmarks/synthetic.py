@@ -0,0 +1,60 @@
+"""Synthetic repos used by the benchmarks."""
+
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.repository import Repository  # noqa: E402
+
+LANGUAGES = ["Python", "C", "C++", "JavaScript", "Rust", "Go", "HTML", "Processing"]
+TOPICS = ["released", "library", "c-library", "javascript-library", "art", "tool"]
+
+
+def synthetic_repos(count: int, seed: int = 0) -> list[Repository]:
+    """Generate a list of random repos.
+
+    Args:
+        count (int): number of repos.
+        seed (int, optional): random seed. Defaults to 0.
+
+    Returns:
+        list[Repository]
+    """
+    rng = random.Random(seed)
+    repos = []
+
+    for i in range(count):
+        created_at = (
+            f"{rng.randint(2010, 2025)}-{rng.randint(1, 12):02d}-"
+            f"{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00Z"
+        )
+        stars = rng.randint(0, 500)
+        repos.append(
+            Repository(
+                name=f"synthetic-repo-{i}",
+                description="a synthetic repository.",
+                html_url=f"https://github.com/synthetic/synthetic-repo-{i}",
+                topics=rng.sample(TOPICS, rng.randint(0, 3)),
+                homepage=rng.choice(["", None, f"https://synthetic.dev/{i}"]),
+                id=i,
+                private=False,
+                stargazers_count=stars,
+                watchers_count=stars,
+                created_at=created_at,
+                updated_at=created_at,
+                pushed_at=created_at,
+                size=rng.randint(1, 100_000),
+                languages=[
+                    {"language": lang, "size": rng.randint(1, 1_000_000)}
+                    for lang in rng.sample(LANGUAGES, rng.randint(0, 3))
+                ],
+                commits_count=rng.randint(0, 1000),
+                forks_count=rng.randint(0, 50),
+                open_issues_count=rng.randint(0, 20),
+                watchers=stars,
+            )
+        )
+
+    return repos
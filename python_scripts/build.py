@@ -3,31 +3,45 @@
 import argparse
 import logging
 
+from modules.assets import AssetPipeline
+from modules.blog import Blog
+from modules.compress import Precompressor
 from modules.deployer import Deployer
+from modules.fonts import FontSubsetter
+from modules.images import ImagePipeline
 from modules.renderer import Renderer
 from modules.scraper import Scraper
 
 
 def build_homepage(
     offline: bool = False,
-    repo_filename: str = "repos.json",
+    incremental: bool = False,
+    repo_filename: str = "repos.jsonl",
     stats_filename: str = "stats.json",
     settings_path: str = "settings.toml",
-    unique_id: str | None = None,
+    precompile: bool = False,
 ) -> None:
     """Build the homepage.
 
     Args:
         offline (bool, optional): If True, does not scrape GitHub. Defaults to False.
-        filename (str, optional): toml file for the repos. Defaults to "repos.json".
+        incremental (bool, optional): If True, only scrapes the repos changed since
+            the last build. Defaults to False.
+        filename (str, optional): toml file for the repos. Defaults to "repos.jsonl".
         settings_path (str, optional): settings file path. Defaults to "settings.toml".
+        precompile (bool, optional): If True, compiles all the templates before
+            rendering. Defaults to False.
     """
     s = Scraper(settings_path=settings_path)
 
     if offline:
         s.load_repos(repo_filename)
     else:
-        loaded = s.scrape_repos(skip_private=True)
+        with s:
+            if incremental:
+                loaded = s.update_repos(repo_filename, skip_private=True)
+            else:
+                loaded = s.scrape_repos(skip_private=True)
         if loaded is None:
             return
 
@@ -35,28 +49,72 @@ def build_homepage(
 
     s.save_stats(path=stats_filename)
 
+    blog = Blog(settings_path=settings_path)
+    articles = blog.load_articles()
+
+    # the renderer reads the hashed names of the bundles and image variants
+    fonts = FontSubsetter(settings_path=settings_path)
+    assets = AssetPipeline(settings_path=settings_path)
+    assets.build(urls=fonts.fonts)
+    ImagePipeline(settings_path=settings_path).build()
+
     r = Renderer(settings_path=settings_path)
+    if precompile:
+        r.precompile()
+
+    jobs = [
+        # base page
+        (
+            "base.html",
+            {
+                "interactive_repos": s.interactive_repos,
+                "repos_list": s.repos_list,
+                "articles": blog.latest(articles),
+            },
+            "../public_html/index.html",
+        ),
+        # blog articles, categories and index
+        *blog.jobs(articles),
+    ]
+    r.render_batch(jobs)
+
+    # the fonts are subset to the characters of the rendered pages, so the
+    # pages are rendered again if the subsets, and with them the bundles, change
+    if fonts.build():
+        assets.build(urls=fonts.fonts)
+        Renderer(settings_path=settings_path).render_batch(jobs)
+
+    Precompressor(settings_path=settings_path).compress()
+
+
+def deploy(
+    settings_path: str = "settings.toml", delete_removed: bool | None = None
+) -> None:
+    """Deploy the website.
 
-    # render base page
-    r.renderFile(
-        "base.html",
-        data={
-            "interactive_repos": s.interactive_repos,
-            "repos_list": s.repos_list,
-            "unique_id": unique_id,
-        },
-        output_path="../public_html/index.html",
+    Args:
+        settings_path (str, optional): settings file path. Defaults to "settings.toml".
+        delete_removed (bool | None, optional): If True, deletes the remote files
+            that no longer exist locally. Defaults to None (from settings).
+    """
+    logging.info("Starting to deploy...")
+    d = Deployer(settings_path=settings_path)
+    d.connect()
+    report = d.deploy(delete_removed=delete_removed)
+    d.disconnect()
+    logging.info(
+        "Deployment finished, %d bytes transferred.", report["bytes_transferred"]
     )
 
 
-def deploy(settings_path: str = "settings.toml") -> None:
-    """Deploy the website."""
-    logging.info("Starting to deploy...")
+def rollback(settings_path: str = "settings.toml") -> None:
+    """Roll the website back to the previous release."""
+    logging.info("Rolling back...")
     d = Deployer(settings_path=settings_path)
     d.connect()
-    d.deploy()
+    d.rollback()
     d.disconnect()
-    logging.info("Deployment finished.")
+    logging.info("Rollback finished.")
 
 
 def gather_arguments() -> argparse.Namespace:
@@ -84,11 +142,31 @@ def gather_arguments() -> argparse.Namespace:
         help="Load repos from local file instead of scraping them",
     )
 
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_true",
+        help="Only scrape the repos changed since the last build",
+    )
+
+    parser.add_argument(
+        "--rollback",
+        action="store_true",
+        help="Roll the website back to the previous release (archive mode)",
+    )
+
+    parser.add_argument(
+        "--delete-removed",
+        action="store_true",
+        default=None,
+        help="Delete remote files that no longer exist locally",
+    )
+
     parser.add_argument(
         "--repo-filename",
         type=str,
         help="Filename to load and save repos from",
-        default="repos.json",
+        default="repos.jsonl",
     )
 
     parser.add_argument(
@@ -106,10 +184,9 @@ def gather_arguments() -> argparse.Namespace:
     )
 
     parser.add_argument(
-        "--unique-id",
-        type=str,
-        help="Unique ID to append to CSS and JS files for cache busting",
-        default=None,
+        "--precompile",
+        action="store_true",
+        help="Compile all the templates ahead of time",
     )
 
     parser.add_argument(
@@ -131,20 +208,26 @@ def main():
         format="%(asctime)s - %(levelname)s - %(message)s",
     )
 
+    if arguments.rollback:
+        rollback(settings_path=arguments.settings)
+        return
+
     if not arguments.homepage and not arguments.deploy:
         return
 
     if arguments.homepage:
         build_homepage(
             offline=arguments.offline,
+            incremental=arguments.incremental,
             repo_filename=arguments.repo_filename,
             stats_filename=arguments.stats_filename,
             settings_path=arguments.settings,
-            unique_id=arguments.unique_id,
+            precompile=arguments.precompile,
         )
     if arguments.deploy:
         deploy(
             settings_path=arguments.settings,
+            delete_removed=arguments.delete_removed,
         )
 
 
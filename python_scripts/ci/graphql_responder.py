@@ -0,0 +1,134 @@
+"""Local stand-in for the GitHub GraphQL API, used to test the backend offline.
+
+The responder serves the repos saved in a repos file, answering the queries
+made by the GraphQL backend of the scraper. Point the scraper to it by setting
+graphql_url = "http://localhost:8000/graphql" in the [Scraper] section.
+"""
+
+import argparse
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ujson
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.repository import Repository  # noqa: E402
+from modules.storage import read_repos  # noqa: E402
+
+PAGE_SIZE = 100
+USER_ID = "U_local"
+
+
+def repository_to_node(repo: Repository) -> dict:
+    """Convert a repository to the node returned by the GraphQL API.
+
+    Returns:
+        dict: Repository node.
+    """
+    return {
+        "databaseId": repo.id,
+        "name": repo.name,
+        "description": repo.description,
+        "url": repo.html_url,
+        "homepageUrl": repo.homepage,
+        "isPrivate": repo.private,
+        "stargazerCount": repo.stargazers_count,
+        "forkCount": repo.forks_count,
+        "diskUsage": repo.size,
+        "createdAt": repo.created_at,
+        "updatedAt": repo.updated_at,
+        "pushedAt": repo.pushed_at,
+        "issues": {"totalCount": repo.open_issues_count},
+        "pullRequests": {"totalCount": 0},
+        "repositoryTopics": {"nodes": [{"topic": {"name": t}} for t in repo.topics]},
+        "languages": {
+            "edges": [
+                {"size": lang["size"], "node": {"name": lang["language"]}}
+                for lang in repo.languages
+            ]
+        },
+        "defaultBranchRef": {
+            "target": {"history": {"totalCount": repo.commits_count}},
+        },
+    }
+
+
+def make_handler(repos: list[Repository]) -> type[BaseHTTPRequestHandler]:
+    """Create the request handler serving a list of repos.
+
+    Returns:
+        type[BaseHTTPRequestHandler]: Request handler class.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            body = ujson.loads(self.rfile.read(length))
+            variables = body.get("variables", {})
+
+            if "repositories" not in body["query"]:
+                data = {"user": {"id": USER_ID}}
+            else:
+                data = {"user": {"repositories": self._page(variables)}}
+
+            payload = ujson.dumps({"data": data}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _page(self, variables: dict) -> dict:
+            selected = sorted(
+                (
+                    r
+                    for r in repos
+                    if variables.get("privacy") != "PUBLIC" or not r.private
+                ),
+                key=lambda r: r.name.lower(),
+            )
+            start = int(variables.get("cursor") or 0)
+            end = start + PAGE_SIZE
+            return {
+                "pageInfo": {
+                    "hasNextPage": end < len(selected),
+                    "endCursor": str(end),
+                },
+                "nodes": [repository_to_node(r) for r in selected[start:end]],
+            }
+
+    return Handler
+
+
+def main() -> None:
+    """Script entry point."""
+    parser = argparse.ArgumentParser(description="Local GitHub GraphQL responder.")
+    parser.add_argument(
+        "--repos",
+        type=str,
+        help="Repos file to serve",
+        default="repos.jsonl",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="Port to listen on",
+        default=8000,
+    )
+
+    arguments = parser.parse_args()
+
+    repos = list(read_repos(arguments.repos))
+
+    server = ThreadingHTTPServer(("localhost", arguments.port), make_handler(repos))
+    print(f"Serving {len(repos)} repos on http://localhost:{arguments.port}/graphql")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Script to convert the repos files between the JSON and snapshot formats."""
+
+import argparse
+import logging
+
+from modules.snapshot import SnapshotRepos, is_snapshot, write_snapshot
+from modules.storage import read_repos, write_repos
+
+
+def convert(input_path: str, output_path: str) -> int:
+    """Convert a repos file.
+
+    A JSON file (in the JSON Lines or the legacy format) is converted to a binary
+    snapshot, a binary snapshot is converted to JSON Lines.
+
+    Args:
+        input_path (str): repos file to convert.
+        output_path (str): converted file path.
+
+    Returns:
+        int: number of converted repos.
+    """
+    if is_snapshot(input_path):
+        logging.info("Converting snapshot %s to JSON %s", input_path, output_path)
+        with SnapshotRepos(input_path) as snapshot:
+            return write_repos(output_path, snapshot)
+
+    logging.info("Converting JSON %s to snapshot %s", input_path, output_path)
+    return write_snapshot(output_path, read_repos(input_path))
+
+
+def main() -> None:
+    """Script entry point."""
+    parser = argparse.ArgumentParser(
+        description="Convert repos files between the JSON and snapshot formats."
+    )
+    parser.add_argument(
+        "input",
+        type=str,
+        help="Repos file to convert",
+    )
+    parser.add_argument(
+        "output",
+        type=str,
+        help="Converted file path",
+    )
+
+    arguments = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+
+    count = convert(arguments.input, arguments.output)
+    logging.info("Converted %d repos", count)
+
+
+if __name__ == "__main__":
+    main()
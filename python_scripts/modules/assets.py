@@ -0,0 +1,273 @@
+"""Asset pipeline, bundling and minifying the CSS and JS files of the website."""
+
+from __future__ import annotations
+
+import logging
+import os
+import posixpath
+import re
+from typing import Callable
+
+import ujson
+
+from modules.manifest import hash_bytes
+from modules.settings import Settings
+
+HASH_LENGTH = 8
+# used without an AssetPipeline section, the bundles linked by the templates
+DEFAULTS = {
+    "public_path": "../public_html/",
+    "bundles": {
+        "css/bundle.css": [
+            "css/vars.css",
+            "css/style.css",
+            "css/animations.css",
+            "css/big-screens.css",
+        ],
+        "js/bundle.js": ["js/secret.js", "js/main.js"],
+        "js/blog.js": ["js/article.js"],
+    },
+}
+
+_css_tokens = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/""", re.S)
+_js_tokens = re.compile(
+    r"""("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`"""
+    # a slash after one of these characters starts a regex literal
+    r"""|[(,=:\[!&|?{};]\s*/(?![/*])(?:\\.|\[(?:\\.|[^\]\\\n])*\]|[^/\\\n])+/[a-z]*)"""
+    r"""|/\*.*?\*/|//[^\n]*""",
+    re.S,
+)
+
+
+_css_urls = re.compile(r"""url\(\s*(["']?)([^"')]+)\1\s*\)""")
+
+
+def rewrite_css_urls(
+    source: str, source_name: str, bundle_name: str, urls: dict[str, str]
+) -> str:
+    """Rewrite the URLs of a stylesheet moved into a bundle.
+
+    The URLs relative to the stylesheet are resolved against the website folder
+    and replaced, if they are listed, with their new file, relative to the
+    bundle.
+
+    Args:
+        source (str): stylesheet.
+        source_name (str): stylesheet path, relative to the website folder.
+        bundle_name (str): bundle path, relative to the website folder.
+        urls (dict[str, str]): new files, keyed by the replaced ones, both
+            relative to the website folder.
+
+    Returns:
+        str: stylesheet with the URLs replaced.
+    """
+
+    def replace(match: re.Match) -> str:
+        url = match.group(2).strip()
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(source_name), url))
+        if path not in urls:
+            return match.group(0)
+
+        relative = posixpath.relpath(urls[path], posixpath.dirname(bundle_name) or ".")
+        return f'url("{relative}")'
+
+    return _css_urls.sub(replace, source)
+
+
+def _minify(source: str, tokens: re.Pattern, compact: Callable[[str], str]) -> str:
+    """Compact the code of a source, removing its comments.
+
+    Args:
+        source (str): source code.
+        tokens (re.Pattern): pattern matching the literals, in its first group,
+            and the comments.
+        compact (Callable[[str], str]): function compacting the code between
+            literals.
+
+    Returns:
+        str: minified source.
+    """
+    parts = []
+    code = ""
+    position = 0
+    for match in tokens.finditer(source):
+        code += source[position : match.start()]
+        position = match.end()
+        if match.group(1):
+            parts.append(compact(code))
+            parts.append(match.group(1))
+            code = ""
+
+    parts.append(compact(code + source[position:]))
+    return "".join(parts).strip()
+
+
+def _compact_css(code: str) -> str:
+    code = re.sub(r"\s+", " ", code)
+    code = re.sub(r" ?([{};,>]) ?", r"\1", code)
+    code = re.sub(r": ", ":", code)
+    return code.replace(";}", "}")
+
+
+def _compact_js(code: str) -> str:
+    return re.sub(r"[ \t]*\n\s*", "\n", code)
+
+
+def minify_css(source: str) -> str:
+    """Minify a stylesheet, removing comments and whitespace.
+
+    Strings are left untouched, and spaces are only removed where they can not
+    change the meaning of a selector or value.
+
+    Args:
+        source (str): stylesheet.
+
+    Returns:
+        str: minified stylesheet.
+    """
+    return _minify(source, _css_tokens, _compact_css)
+
+
+def minify_js(source: str) -> str:
+    """Minify a script, removing comments, indentation and empty lines.
+
+    Line breaks are kept, so that automatic semicolon insertion is unaffected.
+    Strings, template literals and regex literals are left untouched.
+
+    Args:
+        source (str): script.
+
+    Returns:
+        str: minified script.
+    """
+    return _minify(source, _js_tokens, _compact_js)
+
+
+class AssetPipeline:
+    """Bundles the CSS and JS files of the website into content-hashed files.
+
+    The bundles are described in the settings, mapping the name of each bundle
+    to the files it contains, and default to the ones linked by the templates.
+    Each bundle is minified and saved with the hash of its content in its name,
+    so it can be cached by browsers forever. The hashed names are saved in an
+    asset manifest, read by the Renderer.
+    """
+
+    _settings: Settings
+
+    def __init__(self, settings_path: str = "settings.toml") -> None:
+        """Create a new AssetPipeline instance.
+
+        Args:
+            settings_path (str, optional): Settings path. Defaults to "settings.toml".
+        """
+        self._settings = Settings.from_toml(
+            settings_path, self.__class__.__name__, DEFAULTS
+        )
+
+    @property
+    def manifest_path(self) -> str:
+        """Get the path of the asset manifest, kept out of the deployed folder."""
+        return self._settings.get("manifest_path", ".cache/asset-manifest.json")
+
+    def build(self, urls: dict[str, str] | None = None) -> dict[str, str]:
+        """Build all the bundles and save the asset manifest.
+
+        Args:
+            urls (dict[str, str] | None, optional): files replacing the ones
+                referenced by the stylesheets, such as font subsets, keyed by
+                the replaced files. Defaults to None.
+
+        Returns:
+            dict[str, str]: hashed file names, keyed by bundle name.
+        """
+        manifest = {
+            name: self._build_bundle(name, sources, urls or {})
+            for name, sources in self._settings.bundles.items()
+        }
+
+        folder = os.path.dirname(self.manifest_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w") as f:
+            ujson.dump(
+                manifest, f, indent=2, sort_keys=True, escape_forward_slashes=False
+            )
+        os.replace(temp_path, self.manifest_path)
+
+        return manifest
+
+    def _build_bundle(self, name: str, sources: list[str], urls: dict[str, str]) -> str:
+        """Bundle and minify files, saving them with a content-hashed name.
+
+        Args:
+            name (str): bundle name, relative to the website folder.
+            sources (list[str]): bundled files, relative to the website folder.
+            urls (dict[str, str]): files replacing the ones referenced by the
+                stylesheets, keyed by the replaced files.
+
+        Returns:
+            str: hashed bundle name.
+        """
+        stem, extension = os.path.splitext(name)
+        if extension == ".css":
+            minify, separator = minify_css, "\n"
+        elif extension == ".js":
+            # a statement left open by a script is closed before the next one
+            minify, separator = minify_js, ";\n"
+        else:
+            minify, separator = (lambda source: source), "\n"
+
+        source_size = 0
+        minified = []
+        for source in sources:
+            with open(os.path.join(self._settings.public_path, source), "r") as f:
+                content = f.read()
+            source_size += len(content.encode("utf-8"))
+            if extension == ".css":
+                content = rewrite_css_urls(content, source, name, urls)
+            minified.append(minify(content))
+
+        data = separator.join(minified).encode("utf-8")
+        hashed_name = f"{stem}.{hash_bytes(data)[:HASH_LENGTH]}{extension}"
+        path = os.path.join(self._settings.public_path, hashed_name)
+
+        if os.path.exists(path):
+            logging.info("Bundle %s is unchanged.", hashed_name)
+        else:
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            logging.info(
+                "Bundled %d files into %s (%d bytes, %d before minifying).",
+                len(sources),
+                hashed_name,
+                len(data),
+                source_size,
+            )
+
+        self._remove_stale(stem, extension, hashed_name)
+        return hashed_name
+
+    def _remove_stale(self, stem: str, extension: str, current: str) -> None:
+        """Remove the previous versions of a bundle.
+
+        Args:
+            stem (str): bundle name, without extension.
+            extension (str): bundle extension.
+            current (str): hashed name of the current version.
+        """
+        folder = os.path.join(self._settings.public_path, os.path.dirname(stem))
+        pattern = re.compile(
+            re.escape(os.path.basename(stem))
+            + rf"\.[0-9a-f]{{{HASH_LENGTH}}}"
+            + re.escape(extension)
+        )
+
+        for filename in os.listdir(folder):
+            if pattern.fullmatch(filename) and filename != os.path.basename(current):
+                logging.info("Removing stale bundle %s", filename)
+                os.remove(os.path.join(folder, filename))
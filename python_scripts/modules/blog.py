@@ -0,0 +1,340 @@
+"""Blog compiler, turning a folder of Markdown articles into render jobs."""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import markdown
+
+from modules.manifest import BuildManifest, hash_file
+from modules.settings import Settings
+
+# folder of the blog pages, relative to the website folder
+BLOG_FOLDER = "blog"
+_front_matter = re.compile(r"\A---\s*\n(.*?)\n---\s*(?:\n|\Z)", re.S)
+
+
+def slugify(text: str) -> str:
+    """Turn a text into a lowercase, URL friendly name.
+
+    Args:
+        text (str): text to convert.
+
+    Returns:
+        str: words of the text, joined by hyphens.
+    """
+    # so that, for example, C and C++ do not get the same name
+    text = text.lower().replace("+", " plus ").replace("#", " sharp ")
+    return re.sub(r"[^a-z0-9]+", "-", text).strip("-")
+
+
+def parse_front_matter(text: str) -> tuple[dict[str, str], str]:
+    """Split an article into its front matter and its Markdown body.
+
+    The front matter is a block of "key: value" lines between two "---" lines,
+    at the start of the article.
+
+    Args:
+        text (str): article.
+
+    Returns:
+        tuple[dict[str, str], str]: front matter values, keyed by lowercase
+            key, and article body.
+    """
+    match = _front_matter.match(text)
+    if match is None:
+        return {}, text
+
+    metadata = {}
+    for line in match.group(1).splitlines():
+        key, separator, value = line.partition(":")
+        if separator:
+            metadata[key.strip().lower()] = value.strip()
+
+    return metadata, text[match.end() :]
+
+
+def compile_article(path: str, extensions: list[str]) -> dict:
+    """Compile a Markdown article.
+
+    Args:
+        path (str): article path.
+        extensions (list[str]): Markdown extensions.
+
+    Returns:
+        dict: article metadata and compiled HTML body.
+
+    Raises:
+        ValueError: If the article has no valid date in its front matter.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        metadata, body = parse_front_matter(f.read())
+
+    slug = slugify(os.path.splitext(os.path.basename(path))[0])
+    try:
+        published = date.fromisoformat(metadata.get("date", "")).isoformat()
+    except ValueError:
+        raise ValueError(f"Article {path} has no valid date (YYYY-MM-DD)") from None
+
+    categories = [c.strip() for c in metadata.get("categories", "").split(",")]
+    return {
+        "slug": slug,
+        "title": metadata.get("title", slug),
+        "date": published,
+        "description": metadata.get("description", ""),
+        "categories": [c for c in categories if c],
+        "draft": metadata.get("draft", "false").lower() == "true",
+        "html": markdown.markdown(body, extensions=extensions),
+    }
+
+
+class Blog:
+    """Compiles the Markdown articles of the blog into render jobs.
+
+    Each article is a Markdown file with a front matter holding its title,
+    date, description and comma separated categories. Articles are compiled
+    in parallel, and only when their file changed since the last build. The
+    render jobs of the article pages, of the category pages and of the blog
+    index are then rendered by the Renderer, which skips the pages whose data
+    and templates did not change. The listings hold no article body, so that
+    editing an article only renders its own page.
+    """
+
+    _settings: Settings
+    _cache: BuildManifest | None
+
+    def __init__(self, settings_path: str = "settings.toml") -> None:
+        """Create a new Blog instance.
+
+        Args:
+            settings_path (str, optional): Settings path. Defaults to "settings.toml".
+        """
+        self._settings = Settings.from_toml(
+            settings_path,
+            self.__class__.__name__,
+            {"public_path": "../public_html/", "articles_path": "../articles/"},
+        )
+
+        cache_path = self._settings.get("cache_path", "")
+        self._cache = BuildManifest(cache_path) if cache_path else None
+
+    @property
+    def _output_path(self) -> str:
+        return os.path.join(self._settings.public_path, BLOG_FOLDER)
+
+    def _article_paths(self) -> list[str]:
+        articles_path = self._settings.articles_path
+        if not os.path.isdir(articles_path):
+            logging.info("Articles folder %s not found.", articles_path)
+            return []
+
+        return sorted(
+            os.path.join(folder, filename)
+            for folder, _, filenames in os.walk(articles_path)
+            for filename in filenames
+            if filename.endswith(".md")
+        )
+
+    def load_articles(self, max_workers: int | None = None) -> list[dict]:
+        """Load the published articles, compiling the changed ones.
+
+        Args:
+            max_workers (int | None, optional): number of processes compiling
+                the articles. Defaults to None (max_workers setting, or the
+                number of CPUs).
+
+        Returns:
+            list[dict]: articles, newest first.
+
+        Raises:
+            ValueError: If an article has no valid date, or two articles have
+                the same name.
+        """
+        extensions = self._settings.get("extensions", ["fenced_code", "tables"])
+
+        articles = {}
+        changed = []
+        for path in self._article_paths():
+            fingerprint = {"source": hash_file(path), "extensions": extensions}
+            if self._cache is not None and self._cache.is_unchanged(
+                path, **fingerprint
+            ):
+                articles[path] = self._cache.get(path)["article"]  # type: ignore
+            else:
+                changed.append((path, fingerprint))
+
+        if max_workers is None:
+            max_workers = int(self._settings.get("max_workers", os.cpu_count() or 1))
+        max_workers = min(max_workers, len(changed))
+        logging.info(
+            "Compiling %d articles with %d workers, %d unchanged.",
+            len(changed),
+            max(max_workers, 1),
+            len(articles),
+        )
+
+        paths = [path for path, _ in changed]
+        if max_workers <= 1:
+            compiled = [compile_article(path, extensions) for path in paths]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                compiled = list(
+                    executor.map(
+                        compile_article,
+                        paths,
+                        [extensions] * len(paths),
+                        chunksize=max(1, len(paths) // (max_workers * 4)),
+                    )
+                )
+
+        for (path, fingerprint), article in zip(changed, compiled):
+            articles[path] = article
+            if self._cache is not None:
+                self._cache.update(path, **fingerprint, article=article)
+
+        if self._cache is not None:
+            self._cache.save()
+
+        slugs = {}
+        for path, article in articles.items():
+            if article["slug"] in slugs:
+                raise ValueError(
+                    f"Articles {slugs[article['slug']]} and {path} have the same name"
+                )
+            slugs[article["slug"]] = path
+
+        published = [a for a in articles.values() if not a["draft"]]
+        published.sort(key=lambda a: a["slug"])
+        published.sort(key=lambda a: a["date"], reverse=True)
+        return published
+
+    def _summary(self, article: dict) -> dict:
+        """Get the listing entry of an article, without its body.
+
+        Args:
+            article (dict): article.
+
+        Returns:
+            dict: title, date, description, categories and url of the article.
+        """
+        # categories differing only by case or punctuation share a page
+        categories = {}
+        for c in article["categories"]:
+            url = f"{BLOG_FOLDER}/category/{slugify(c)}.html"
+            categories.setdefault(url, {"name": c, "url": url})
+
+        return {
+            "title": article["title"],
+            "date": article["date"],
+            "description": article["description"],
+            "categories": list(categories.values()),
+            "url": f"{BLOG_FOLDER}/{article['slug']}.html",
+        }
+
+    def latest(self, articles: list[dict], count: int | None = None) -> list[dict]:
+        """Get the listing entries of the newest articles, for the homepage.
+
+        Args:
+            articles (list[dict]): articles, newest first.
+            count (int | None, optional): number of articles. Defaults to None
+                (homepage_articles setting).
+
+        Returns:
+            list[dict]
+        """
+        if count is None:
+            count = int(self._settings.get("homepage_articles", 5))
+        return [self._summary(a) for a in articles[:count]]
+
+    def jobs(self, articles: list[dict]) -> list[tuple[str, dict, str]]:
+        """Get the render jobs of the blog pages, removing the stale ones.
+
+        Args:
+            articles (list[dict]): articles, newest first.
+
+        Returns:
+            list[tuple[str, dict, str]]: template name, data and output path of
+                each page, empty if there are no articles.
+        """
+        if not articles:
+            self._remove_stale(set())
+            return []
+
+        output_path = self._output_path
+        os.makedirs(os.path.join(output_path, "category"), exist_ok=True)
+
+        summaries = [self._summary(a) for a in articles]
+        categories: dict[str, dict] = {}
+        for summary in summaries:
+            for category in summary["categories"]:
+                # the page is named after the slug, the newest spelling is shown
+                entry = categories.setdefault(
+                    category["url"], {**category, "articles": []}
+                )
+                entry["articles"].append(summary)
+
+        jobs = []
+        for article, summary in zip(articles, summaries):
+            jobs.append(
+                (
+                    self._settings.get("article_template", "article.html"),
+                    {"article": {**summary, "html": article["html"]}, "root": "../"},
+                    os.path.join(output_path, f"{article['slug']}.html"),
+                )
+            )
+
+        ordered = sorted(categories.values(), key=lambda c: c["name"].lower())
+        for category in ordered:
+            jobs.append(
+                (
+                    self._settings.get("category_template", "category.html"),
+                    {
+                        "category": category["name"],
+                        "articles": category["articles"],
+                        "root": "../../",
+                    },
+                    os.path.join(
+                        output_path, "category", os.path.basename(category["url"])
+                    ),
+                )
+            )
+
+        jobs.append(
+            (
+                self._settings.get("index_template", "blog.html"),
+                {
+                    "articles": summaries,
+                    "categories": [
+                        {
+                            "name": c["name"],
+                            "url": c["url"],
+                            "count": len(c["articles"]),
+                        }
+                        for c in ordered
+                    ],
+                    "root": "../",
+                },
+                os.path.join(output_path, "index.html"),
+            )
+        )
+
+        self._remove_stale({job[2] for job in jobs})
+        return jobs
+
+    def _remove_stale(self, outputs: set[str]) -> None:
+        """Remove the pages of deleted articles and categories.
+
+        Args:
+            outputs (set[str]): paths of the current pages.
+        """
+        outputs = {os.path.normpath(o) for o in outputs}
+        for folder, _, filenames in os.walk(self._output_path):
+            for filename in filenames:
+                path = os.path.normpath(os.path.join(folder, filename))
+                if filename.endswith(".html") and path not in outputs:
+                    logging.info("Removing stale page %s", path)
+                    os.remove(path)
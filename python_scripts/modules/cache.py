@@ -0,0 +1,199 @@
+"""On-disk cache for conditional HTTP requests."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+import ujson
+
+
+class ResponseCache:
+    """On-disk cache of HTTP responses, validated with ETag/Last-Modified.
+
+    Each response is stored in its own file, keyed by URL and query parameters.
+    The file modification time records when the entry was last validated and is
+    used for both the age and the size based eviction.
+    """
+
+    _path: str
+    _max_age: float
+    _max_size: int
+
+    def __init__(
+        self,
+        path: str,
+        max_age: float = 7 * 24 * 60 * 60,
+        max_size: int = 50 * 1024 * 1024,
+    ) -> None:
+        """Create a new ResponseCache instance.
+
+        Args:
+            path (str): Folder containing the cached responses.
+            max_age (float, optional): Seconds after which an entry that was not
+                validated is evicted. Defaults to one week.
+            max_size (int, optional): Maximum total size of the cache in bytes.
+                Defaults to 50 MB.
+        """
+        self._path = path
+        self._max_age = max_age
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._bytes_saved = 0
+        os.makedirs(self._path, exist_ok=True)
+
+    def _entry_path(self, url: str, params: dict | None) -> str:
+        key = url
+        if params:
+            key += "?" + urlencode(sorted(params.items()))
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self._path, f"{digest}.json")
+
+    def get(self, url: str, params: dict | None = None) -> dict | None:
+        """Get the cached entry for a request.
+
+        Args:
+            url (str): Request URL.
+            params (dict | None, optional): Query parameters. Defaults to None.
+
+        Returns:
+            dict | None: Cached entry, None if the request is not cached.
+        """
+        try:
+            with open(self._entry_path(url, params), "r") as f:
+                return ujson.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def conditional_headers(entry: dict | None) -> dict[str, str]:
+        """Get the headers needed to validate a cached entry.
+
+        Args:
+            entry (dict | None): Cached entry.
+
+        Returns:
+            dict[str, str]: If-None-Match and If-Modified-Since headers.
+        """
+        headers = {}
+        if entry is None:
+            return headers
+
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url: str, params: dict | None, response: requests.Response) -> None:
+        """Store a response in the cache.
+
+        Every stored response counts as a cache miss. Responses without an ETag
+        or a Last-Modified header cannot be validated and are not stored.
+
+        Args:
+            url (str): Request URL.
+            params (dict | None): Query parameters.
+            response (requests.Response): Response to store.
+        """
+        with self._lock:
+            self._misses += 1
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            return
+
+        entry = {
+            "url": url,
+            "params": params,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content": response.text,
+        }
+        path = self._entry_path(url, params)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            ujson.dump(entry, f)
+        os.replace(temp_path, path)
+
+    def revalidated(
+        self, url: str, params: dict | None, entry: dict, response: requests.Response
+    ) -> requests.Response:
+        """Build a full response from a cached entry after a 304 Not Modified.
+
+        Args:
+            url (str): Request URL.
+            params (dict | None): Query parameters.
+            entry (dict): Cached entry.
+            response (requests.Response): 304 response sent by the server.
+
+        Returns:
+            requests.Response: Response with the cached content.
+        """
+        content = entry["content"].encode("utf-8")
+        try:
+            os.utime(self._entry_path(url, params))
+        except OSError:
+            pass
+
+        with self._lock:
+            self._hits += 1
+            self._bytes_saved += len(content)
+
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.url = response.url
+        cached.headers = response.headers
+        cached.encoding = "utf-8"
+        cached._content = content
+        return cached
+
+    def prune(self) -> None:
+        """Evict the old entries, then shrink the cache to its maximum size.
+
+        The least recently validated entries are evicted first.
+        """
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self._path):
+            if not entry.name.endswith(".json"):
+                continue
+            stat = entry.stat()
+            if now - stat.st_mtime > self._max_age:
+                os.remove(entry.path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total_size <= self._max_size:
+                break
+            os.remove(path)
+            total_size -= size
+            evicted += 1
+
+        logging.info(
+            "Pruned response cache, %d entries (%d bytes) left, %d evicted",
+            len(entries) - evicted,
+            total_size,
+            evicted,
+        )
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Get the hits, misses and bytes saved by the cache."""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "bytes_saved": self._bytes_saved,
+            }
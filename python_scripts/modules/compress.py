@@ -0,0 +1,208 @@
+"""Precompression of the website files, so that they are not compressed on request."""
+
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+
+from modules.manifest import BuildManifest, hash_file
+from modules.settings import Settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, only gzip variants are written without it
+    brotli = None
+
+
+class Precompressor:
+    """Writes gzip and brotli compressed siblings of the website text files.
+
+    Each compressible file gets a .gz sibling and, if the brotli package is
+    installed, a .br sibling, both compressed at the maximum level. Files whose
+    content did not change since the last run are skipped, and a variant that
+    is not smaller than its file is not kept.
+    """
+
+    _settings: Settings
+    _manifest: BuildManifest | None
+
+    def __init__(self, settings_path: str = "settings.toml") -> None:
+        """Create a new Precompressor instance.
+
+        Args:
+            settings_path (str, optional): Settings path. Defaults to "settings.toml".
+        """
+        self._settings = Settings.from_toml(
+            settings_path, self.__class__.__name__, {"public_path": "../public_html/"}
+        )
+
+        manifest_path = self._settings.get("manifest_path", "")
+        self._manifest = BuildManifest(manifest_path) if manifest_path else None
+
+        self._encodings = {".gz": self._gzip}
+        if brotli is not None and self._settings.get("brotli", True):
+            self._encodings[".br"] = self._brotli
+        elif self._settings.get("brotli", True):
+            logging.info("brotli is not installed, only gzip variants are written.")
+
+    @staticmethod
+    def _gzip(data: bytes) -> bytes:
+        # no timestamp, so that the same file always gives the same variant
+        return gzip.compress(data, compresslevel=9, mtime=0)
+
+    @staticmethod
+    def _brotli(data: bytes) -> bytes:
+        return brotli.compress(data, quality=11)  # type: ignore
+
+    @property
+    def _extensions(self) -> tuple[str, ...]:
+        return tuple(
+            self._settings.get(
+                "extensions", [".html", ".css", ".js", ".json", ".svg", ".txt"]
+            )
+        )
+
+    def _compressible_files(self) -> list[str]:
+        """Get the paths of the files to compress.
+
+        Returns:
+            list[str]
+        """
+        extensions = self._extensions
+        min_size = int(self._settings.get("min_size", 256))
+
+        files = []
+        for folder, _, filenames in os.walk(self._settings.public_path):
+            for filename in filenames:
+                path = os.path.join(folder, filename)
+                if filename.endswith(extensions) and os.path.getsize(path) >= min_size:
+                    files.append(path)
+
+        return sorted(files)
+
+    def _remove_orphans(self) -> int:
+        """Remove the compressed variants whose file no longer exists.
+
+        Returns:
+            int: number of removed variants.
+        """
+        removed = 0
+        for folder, _, filenames in os.walk(self._settings.public_path):
+            for filename in filenames:
+                source, extension = os.path.splitext(filename)
+                if (
+                    extension in (".gz", ".br")
+                    and source.endswith(self._extensions)
+                    and source not in filenames
+                ):
+                    logging.info("Removing orphaned variant %s", filename)
+                    os.remove(os.path.join(folder, filename))
+                    removed += 1
+
+        return removed
+
+    @staticmethod
+    def _add_sizes(
+        report: dict[str, int], size: int, sizes: dict[str, int | None]
+    ) -> None:
+        report["size"] += size
+        for extension, variant_size in sizes.items():
+            # a file without a variant is sent as it is
+            report[f"{extension[1:]}_size"] += variant_size or size
+
+    def _compress_file(self, path: str, report: dict[str, int]) -> None:
+        """Write the compressed variants of a file, unless it did not change.
+
+        Args:
+            path (str): file path.
+            report (dict[str, int]): compression report, updated in place.
+        """
+        source_hash = hash_file(path)
+        encodings = sorted(self._encodings)
+
+        entry = self._manifest.get(path) if self._manifest is not None else None
+        if (
+            entry is not None
+            and self._manifest.is_unchanged(  # type: ignore
+                path, source=source_hash, encodings=encodings
+            )
+            and all(
+                os.path.exists(f"{path}{extension}")
+                for extension, size in entry["sizes"].items()
+                if size is not None
+            )
+        ):
+            report["skipped"] += 1
+            self._add_sizes(report, entry["size"], entry["sizes"])
+            return
+
+        with open(path, "rb") as f:
+            data = f.read()
+
+        sizes: dict[str, int | None] = {}
+        for extension, compress in self._encodings.items():
+            variant = f"{path}{extension}"
+            compressed = compress(data)
+
+            if len(compressed) >= len(data):
+                if os.path.exists(variant):
+                    os.remove(variant)
+                sizes[extension] = None
+                continue
+
+            temp_path = f"{variant}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(compressed)
+            os.replace(temp_path, variant)
+            sizes[extension] = len(compressed)
+
+        report["compressed"] += 1
+        self._add_sizes(report, len(data), sizes)
+        if self._manifest is not None:
+            self._manifest.update(
+                path,
+                source=source_hash,
+                encodings=encodings,
+                size=len(data),
+                sizes=sizes,
+            )
+
+    def compress(self) -> dict[str, int]:
+        """Write the compressed variants of all the compressible files.
+
+        Returns:
+            dict[str, int]: number of compressed and skipped files, total size
+                of the files and of their gzip and brotli variants.
+        """
+        report = {
+            "compressed": 0,
+            "skipped": 0,
+            "removed": self._remove_orphans(),
+            "size": 0,
+            "gz_size": 0,
+            "br_size": 0,
+        }
+
+        for path in self._compressible_files():
+            self._compress_file(path, report)
+
+        if self._manifest is not None:
+            self._manifest.save()
+
+        for extension in self._encodings:
+            size = report[f"{extension[1:]}_size"]
+            logging.info(
+                "%s variants: %d bytes, %d before compression (%.1f%% saved).",
+                extension,
+                size,
+                report["size"],
+                100 * (1 - size / report["size"]) if report["size"] else 0,
+            )
+        logging.info(
+            "Compressed %d files, skipped %d unchanged, removed %d orphaned variants.",
+            report["compressed"],
+            report["skipped"],
+            report["removed"],
+        )
+        return report
@@ -3,31 +3,71 @@
 from __future__ import annotations
 
 import hashlib
+import io
 import logging
 import os
+import posixpath
 import re
-from glob import glob
+import shlex
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
 
 import paramiko
+import ujson
 
+from modules.manifest import BuildManifest, hash_file
 from modules.settings import Settings
 
+# local path, remote path and, if the remote copy has to be checked, local hash
+UploadJob = tuple[str, str, str | None]
+# names of the archive mode releases, anything else in their folder is left alone
+RELEASE_PATTERN = r"0-initial|[0-9]{8}T[0-9]{6}Z"
+
+
+class _ChunkBuffer:
+    """Write-only buffer, emptied each time it is drained."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self.total = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self.total += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
 
 class Deployer:
-    """Deployer class."""
+    """Deployer class.
+
+    The remote server keeps a manifest of the deployed files (path, size,
+    modification time and SHA256 hash), so a deploy only needs to compare it
+    with the local files to find the ones to upload.
+    """
 
     _settings: Settings
     _client: paramiko.SSHClient
     _sftp: paramiko.SFTPClient
+    _hash_cache: BuildManifest | None
 
     def __init__(self, settings_path="settings.toml") -> None:
-        """Create a new Renderer instance.
+        """Create a new Deployer instance.
 
         Args:
             settings_path (str, optional): Settings path. Defaults to "settings.toml".
         """
         self._settings = Settings.from_toml(settings_path, self.__class__.__name__)
 
+        hash_cache_path = self._settings.get("hash_cache_path", "")
+        self._hash_cache = BuildManifest(hash_cache_path) if hash_cache_path else None
+
     def connect(self):
         """Connect to the remote server."""
         logging.info("Connecting to remote server...")
@@ -47,18 +87,448 @@ class Deployer:
         self._sftp.close()
         self._client.close()
 
-    def deploy(self):
-        """Deploy local files to the remote server."""
-        for local_path in glob(self._settings.local_path + "/**/*", recursive=True):
-            remote_path = self._settings.remote_path + re.sub(
-                r".*" + self._settings.local_path, "", local_path
+    @property
+    def _manifest_path(self) -> str:
+        return self._remote_path(
+            self._settings.get("manifest_name", ".deploy-manifest.json")
+        )
+
+    def _remote_path(self, relative_path: str) -> str:
+        return posixpath.join(self._settings.remote_path, relative_path)
+
+    @staticmethod
+    def _parent_folders(relative_paths: Iterable[str]) -> set[str]:
+        folders = set()
+        for relative_path in relative_paths:
+            folder = posixpath.dirname(relative_path)
+            while folder and folder not in folders:
+                folders.add(folder)
+                folder = posixpath.dirname(folder)
+
+        return folders
+
+    def _local_files(self) -> dict[str, str]:
+        """Get the local files to deploy.
+
+        Returns:
+            dict[str, str]: local paths, keyed by path relative to the local folder.
+        """
+        local_root = self._settings.local_path
+        files = {}
+        for folder, _, filenames in os.walk(local_root):
+            for filename in filenames:
+                local_path = os.path.join(folder, filename)
+                relative_path = os.path.relpath(local_path, local_root)
+                files[relative_path.replace(os.sep, "/")] = local_path
+
+        return files
+
+    def _local_manifest(self, files: dict[str, str]) -> dict[str, dict]:
+        """Get the size, modification time and hash of the local files.
+
+        Hashes are read from the local cache when the size and modification
+        time of a file did not change. The other files are hashed in chunks, in
+        parallel threads.
+
+        Args:
+            files (dict[str, str]): local paths, keyed by relative path.
+
+        Returns:
+            dict[str, dict]: file entries, keyed by relative path.
+        """
+        cache = self._hash_cache
+        manifest = {}
+        to_hash = []
+        for relative_path, local_path in files.items():
+            stat = os.stat(local_path)
+            entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+            if cache is not None and cache.is_unchanged(local_path, **entry):
+                entry["sha256"] = cache.get(local_path)["sha256"]  # type: ignore
+            else:
+                to_hash.append(relative_path)
+            manifest[relative_path] = entry
+
+        # hashlib releases the GIL while hashing, so threads run in parallel
+        with ThreadPoolExecutor() as executor:
+            hashes = executor.map(hash_file, (files[p] for p in to_hash))
+            for relative_path, sha256 in zip(to_hash, hashes):
+                manifest[relative_path]["sha256"] = sha256
+
+        if cache is not None:
+            for relative_path, entry in manifest.items():
+                cache.update(files[relative_path], **entry)
+
+        if cache is not None:
+            cache.save()
+        return manifest
+
+    def _read_remote_manifest(self) -> dict[str, dict] | None:
+        """Read the manifest of the deployed files.
+
+        Returns:
+            dict[str, dict] | None: file entries, None if there is no manifest.
+        """
+        try:
+            with self._sftp.open(self._manifest_path, "r") as f:
+                return ujson.loads(f.read())
+        except (IOError, ValueError):
+            logging.info("No remote manifest found.")
+            return None
+
+    def _write_remote_manifest(self, manifest: dict[str, dict]) -> None:
+        """Write the manifest of the deployed files, replacing it atomically.
+
+        Args:
+            manifest (dict[str, dict]): file entries, keyed by relative path.
+        """
+        temp_path = f"{self._manifest_path}.tmp"
+        with self._sftp.open(temp_path, "w") as f:
+            f.write(ujson.dumps(manifest, sort_keys=True, escape_forward_slashes=False))
+        self._sftp.posix_rename(temp_path, self._manifest_path)
+
+    def deploy(self, delete_removed: bool | None = None) -> dict[str, int]:
+        """Deploy local files to the remote server.
+
+        Only the files whose hash differs from the remote manifest are uploaded,
+        either over SFTP or, in archive mode, as a new release. Over SFTP, if
+        the server has no manifest, each file is compared with its remote copy.
+
+        Args:
+            delete_removed (bool | None, optional): If True, remote files that no
+                longer exist locally are deleted. Defaults to None (the
+                delete_removed setting).
+
+        Returns:
+            dict[str, int]: number of uploaded, skipped and deleted files, and
+                bytes transferred.
+        """
+        if delete_removed is None:
+            delete_removed = bool(self._settings.get("delete_removed", False))
+
+        files = self._local_files()
+        local_manifest = self._local_manifest(files)
+        remote_manifest = self._read_remote_manifest()
+        report = {"uploaded": 0, "skipped": 0, "deleted": 0, "bytes_transferred": 0}
+
+        remote_hashes = None
+        if remote_manifest is None:
+            remote_hashes = self._hash_remote_files()
+
+        if remote_manifest is None and remote_hashes is None:
+            changed = list(files)
+            removed = []
+        elif remote_manifest is None:
+            changed = [
+                relative_path
+                for relative_path, entry in local_manifest.items()
+                if remote_hashes.get(relative_path) != entry["sha256"]  # type: ignore
+            ]
+            # without a manifest, deployed files cannot be told from other ones
+            removed = []
+        else:
+            changed = [
+                relative_path
+                for relative_path, entry in local_manifest.items()
+                if remote_manifest.get(relative_path, {}).get("sha256")
+                != entry["sha256"]
+            ]
+            removed = sorted(remote_manifest.keys() - local_manifest.keys())
+            if not delete_removed:
+                # files that are kept on the server stay in the manifest
+                for relative_path in removed:
+                    local_manifest[relative_path] = remote_manifest[relative_path]
+                removed = []
+        report["skipped"] = len(files) - len(changed)
+
+        if self._settings.get("mode", "sftp") == "archive":
+            self._deploy_archive(files, changed, removed, local_manifest, report)
+        else:
+            self._deploy_sftp(
+                files,
+                changed,
+                removed,
+                local_manifest,
+                self._parent_folders(remote_hashes or remote_manifest or {}),
+                check_remote=remote_manifest is None and remote_hashes is None,
+                report=report,
+            )
+
+        logging.info(
+            "Uploaded %d files (%d bytes), skipped %d, deleted %d.",
+            report["uploaded"],
+            report["bytes_transferred"],
+            report["skipped"],
+            report["deleted"],
+        )
+        return report
+
+    def _deploy_sftp(
+        self,
+        files: dict[str, str],
+        changed: list[str],
+        removed: list[str],
+        local_manifest: dict[str, dict],
+        remote_folders: set[str],
+        check_remote: bool,
+        report: dict[str, int],
+    ) -> None:
+        """Upload the changed files over SFTP, in place.
+
+        Args:
+            files (dict[str, str]): local paths, keyed by relative path.
+            changed (list[str]): relative paths of the files to upload.
+            removed (list[str]): relative paths of the remote files to delete.
+            local_manifest (dict[str, dict]): manifest to write on the server.
+            remote_folders (set[str]): relative paths of the existing folders.
+            check_remote (bool): If True, each file is compared with its remote
+                copy before being uploaded.
+            report (dict[str, int]): deploy report, updated in place.
+        """
+        folders = self._parent_folders(changed) - remote_folders
+        for folder in sorted(folders, key=lambda f: (f.count("/"), f)):
+            self.create_folder(self._remote_path(folder))
+
+        jobs = [
+            (
+                files[relative_path],
+                self._remote_path(relative_path),
+                local_manifest[relative_path]["sha256"] if check_remote else None,
             )
+            for relative_path in changed
+        ]
+        for uploaded, skipped, transferred in self._upload_parallel(jobs):
+            report["uploaded"] += uploaded
+            report["skipped"] += skipped
+            report["bytes_transferred"] += transferred
+
+        for relative_path in removed:
+            logging.info("Deleting %s", self._remote_path(relative_path))
+            try:
+                self._sftp.remove(self._remote_path(relative_path))
+                report["deleted"] += 1
+            except IOError:
+                logging.info("File %s already removed.", relative_path)
+
+        self._write_remote_manifest(local_manifest)
+
+    @property
+    def _releases_path(self) -> str:
+        return self._settings.get("releases_path", "") or (
+            self._settings.remote_path.rstrip("/") + ".releases"
+        )
+
+    def _exec(self, command: str, stdin: Iterable[bytes] | None = None) -> str:
+        """Run a shell command on the remote server.
+
+        Args:
+            command (str): command to run.
+            stdin (Iterable[bytes] | None, optional): data streamed to the
+                command standard input. Defaults to None.
+
+        Returns:
+            str: standard output of the command.
+
+        Raises:
+            IOError: If the command exits with a non-zero status.
+        """
+        logging.debug("Running remote command: %s", command)
+        channel_stdin, stdout, stderr = self._client.exec_command(command)
+        if stdin is not None:
+            for chunk in stdin:
+                channel_stdin.write(chunk)
+        channel_stdin.channel.shutdown_write()
+
+        output = stdout.read().decode("utf-8")
+        status = stdout.channel.recv_exit_status()
+        if status != 0:
+            error = stderr.read().decode("utf-8").strip()
+            raise IOError(f"Remote command failed with status {status}: {error}")
+        return output
+
+    def _deploy_archive(
+        self,
+        files: dict[str, str],
+        changed: list[str],
+        removed: list[str],
+        local_manifest: dict[str, dict],
+        report: dict[str, int],
+    ) -> None:
+        """Upload the changed files as a new release, then switch to it.
+
+        The new release folder starts as a hard-linked copy of the current one.
+        The changed files and the manifest are streamed as a single compressed
+        tar archive and extracted over it, unlinking the files first so that
+        the previous release is left untouched. The remote path is a symlink,
+        swapped to the new release with a rename.
+
+        Args:
+            files (dict[str, str]): local paths, keyed by relative path.
+            changed (list[str]): relative paths of the files to upload.
+            removed (list[str]): relative paths of the remote files to delete.
+            local_manifest (dict[str, dict]): manifest to write in the release.
+            report (dict[str, int]): deploy report, updated in place.
+        """
+        current = self._settings.remote_path.rstrip("/")
+        releases = self._releases_path
+        release = posixpath.join(
+            releases, time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        )
+        # sorts before the timestamped releases
+        initial = posixpath.join(releases, "0-initial")
+        keep_releases = max(1, int(self._settings.get("keep_releases", 5)))
+        manifest_name = self._settings.get("manifest_name", ".deploy-manifest.json")
+        q = shlex.quote
+
+        script = [
+            "set -e",
+            f"mkdir -p {q(releases)}",
+            # the first time, the deployed folder becomes the first release
+            f"if [ -d {q(current)} ] && [ ! -L {q(current)} ]; then "
+            f"mv {q(current)} {q(initial)}; ln -s {q(initial)} {q(current)}; fi",
+            f"mkdir {q(release)}",
+            f"if [ -e {q(current)} ]; then "
+            f'cp -al "$(readlink -f {q(current)})/." {q(release)}/; fi',
+        ]
+        if removed:
+            paths = " ".join(q(posixpath.join(release, p)) for p in removed)
+            script.append(f"rm -f {paths}")
+        script += [
+            f"tar -xzUf - -C {q(release)}",
+            f"ln -sfn {q(release)} {q(current + '.tmp')}",
+            f"mv -T {q(current + '.tmp')} {q(current)}",
+            # only the oldest releases are removed, never the one in use
+            f'active="$(readlink -f {q(current)})"',
+            f"cd {q(releases)}",
+            f"ls -1 | grep -xE {q(RELEASE_PATTERN)} | sort -r "
+            f"| tail -n +{keep_releases + 1} | while IFS= read -r name; do "
+            f'if [ "$(readlink -f "$name")" != "$active" ]; then rm -rf -- "$name"; '
+            "fi; done",
+        ]
+
+        def archive() -> Iterator[bytes]:
+            buffer = _ChunkBuffer()
+            with tarfile.open(fileobj=buffer, mode="w|gz") as tar:
+                for relative_path in changed:
+                    tar.add(files[relative_path], relative_path, recursive=False)
+                    yield buffer.drain()
+
+                manifest = ujson.dumps(
+                    local_manifest, sort_keys=True, escape_forward_slashes=False
+                ).encode("utf-8")
+                info = tarfile.TarInfo(manifest_name)
+                info.size = len(manifest)
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(manifest))
+
+            data = buffer.drain()
+            report["bytes_transferred"] = buffer.total
+            yield data
+
+        logging.info("Deploying %d files to release %s", len(changed), release)
+        self._exec("\n".join(script), archive())
+        report["uploaded"] = len(changed)
+        report["deleted"] = len(removed)
+        logging.info("Switched %s to release %s", current, release)
+
+    def rollback(self) -> str:
+        """Switch the remote path back to the release before the current one.
+
+        Returns:
+            str: path of the release now in use.
+
+        Raises:
+            IOError: If there is no previous release.
+        """
+        current = self._settings.remote_path.rstrip("/")
+        releases = sorted(
+            name
+            for name in self._sftp.listdir(self._releases_path)
+            if re.fullmatch(RELEASE_PATTERN, name)
+        )
+        active = posixpath.basename(self._sftp.readlink(current) or "")
+
+        if active not in releases or releases.index(active) == 0:
+            raise IOError(f"No release before {active} to roll back to")
+
+        previous = posixpath.join(
+            self._releases_path, releases[releases.index(active) - 1]
+        )
+        q = shlex.quote
+        self._exec(
+            f"ln -sfn {q(previous)} {q(current + '.tmp')} && "
+            f"mv -T {q(current + '.tmp')} {q(current)}"
+        )
+        logging.info("Rolled %s back to release %s", current, previous)
+        return previous
+
+    def _upload_parallel(self, jobs: list[UploadJob]) -> list[tuple[int, int, int]]:
+        """Upload files across multiple SFTP channels.
+
+        The files are split between the channels by size, each channel is
+        opened over the existing SSH transport and used by its own thread.
+
+        Args:
+            jobs (list[UploadJob]): files to upload.
+
+        Returns:
+            list[tuple[int, int, int]]: uploaded files, skipped files and bytes
+                transferred by each channel.
+        """
+        channels = max(1, min(int(self._settings.get("channels", 1)), len(jobs)))
+        if channels == 1:
+            return [self._upload_files(self._sftp, jobs)]
+
+        # largest files first, each one to the least loaded channel
+        batches: list[list[UploadJob]] = [[] for _ in range(channels)]
+        loads = [0] * channels
+        for job in sorted(jobs, key=lambda j: os.path.getsize(j[0]), reverse=True):
+            channel = loads.index(min(loads))
+            batches[channel].append(job)
+            loads[channel] += os.path.getsize(job[0])
+
+        logging.info("Uploading %d files over %d channels", len(jobs), channels)
+        with ThreadPoolExecutor(max_workers=channels) as executor:
+            return list(executor.map(self._upload_channel, batches))
+
+    def _upload_channel(self, jobs: list[UploadJob]) -> tuple[int, int, int]:
+        sftp = self._client.open_sftp()
+        try:
+            return self._upload_files(sftp, jobs)
+        finally:
+            sftp.close()
+
+    def _upload_files(
+        self, sftp: paramiko.SFTPClient, jobs: list[UploadJob]
+    ) -> tuple[int, int, int]:
+        """Upload files over a SFTP channel.
+
+        Args:
+            sftp (paramiko.SFTPClient): channel to upload the files with.
+            jobs (list[UploadJob]): files to upload.
+
+        Returns:
+            tuple[int, int, int]: uploaded files, skipped files and bytes
+                transferred.
+        """
+        uploaded = skipped = transferred = 0
+        for local_path, remote_path, local_hash in jobs:
             logging.info("Uploading %s to %s", local_path, remote_path)
 
-            if os.path.isdir(local_path):
-                self.create_folder(remote_path)
-            else:
-                self.upload_file(local_path, remote_path)
+            if (
+                local_hash is not None
+                and self._hash_remote_file(remote_path, sftp) == local_hash
+            ):
+                logging.info("File skipped (remote file has the same hash).")
+                skipped += 1
+                continue
+
+            # put writes the file pipelined, without waiting for each chunk
+            attributes = sftp.put(local_path, remote_path)
+            uploaded += 1
+            transferred += attributes.st_size or 0
+
+        return uploaded, skipped, transferred
 
     def create_folder(self, remote_path: str) -> None:
         """Create a folder on the remote server."""
@@ -67,27 +537,45 @@ class Deployer:
         except IOError:
             logging.info("Folder %s already exists.", remote_path)
 
-    def _hash_remote_file(self, remote_path: str) -> str | None:
-        """Get the SHA256 hash of a remote file."""
+    def _hash_remote_files(self) -> dict[str, str] | None:
+        """Get the SHA256 hashes of all the remote files, with a single command.
+
+        Returns:
+            dict[str, str] | None: hashes, keyed by relative path. None if the
+                hashes could not be computed on the server.
+        """
+        remote_path = shlex.quote(self._settings.remote_path)
         try:
-            with self._sftp.open(remote_path, "rb") as f:
-                file_data = f.read()
-                return hashlib.sha256(file_data).hexdigest()
-        except IOError:
+            output = self._exec(
+                f"cd {remote_path} && find . -type f -exec sha256sum {{}} +"
+            )
+        except (IOError, paramiko.SSHException) as e:
+            logging.info("Remote hashing not available: %s", e)
             return None
 
-    def _hash_local_file(self, local_path: str) -> str:
-        """Get the SHA256 hash of a local file."""
-        with open(local_path, "rb") as f:
-            file_data = f.read()
-            return hashlib.sha256(file_data).hexdigest()
+        hashes = {}
+        for line in output.splitlines():
+            # names with special characters are escaped, and start with a backslash
+            if not line or line.startswith("\\"):
+                continue
+            sha256, path = line.split("  ", 1)
+            hashes[posixpath.normpath(path)] = sha256
 
-    def upload_file(self, local_path: str, remote_path: str) -> None:
-        """Upload a file to the remote server."""
-        local_hash = self._hash_local_file(local_path)
-        remote_hash = self._hash_remote_file(remote_path)
+        logging.info("Hashed %d remote files on the server.", len(hashes))
+        return hashes
 
-        if remote_hash is None or local_hash != remote_hash:
-            self._sftp.put(local_path, remote_path)
-        else:
-            logging.info("File skipped (remote file has the same hash).")
+    def _hash_remote_file(
+        self, remote_path: str, sftp: paramiko.SFTPClient | None = None
+    ) -> str | None:
+        """Get the SHA256 hash of a remote file, reading it in chunks."""
+        sha = hashlib.sha256()
+        try:
+            with (sftp or self._sftp).open(remote_path, "rb") as f:
+                # the chunks are requested ahead, without a round trip per read
+                f.prefetch()
+                while chunk := f.read(1024 * 1024):
+                    sha.update(chunk)
+        except IOError:
+            return None
+
+        return sha.hexdigest()
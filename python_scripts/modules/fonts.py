@@ -0,0 +1,236 @@
+"""Font subsetting, reducing the website fonts to the characters of its pages."""
+
+from __future__ import annotations
+
+import io
+import logging
+import os
+import unicodedata
+from html.parser import HTMLParser
+
+import ujson
+
+from modules.manifest import BuildManifest, hash_bytes, hash_file
+from modules.settings import Settings
+
+try:
+    from fontTools import subset
+
+    # fontTools logs each subsetting step
+    logging.getLogger("fontTools").setLevel(logging.WARNING)
+except ImportError:  # fontTools is optional, the full fonts are used without it
+    subset = None
+
+try:
+    import brotli
+except ImportError:  # brotli is needed by fontTools to write WOFF2 files
+    brotli = None
+
+HASH_LENGTH = 8
+# always kept, so that text added by scripts or templates is likely covered
+PRINTABLE_ASCII = frozenset(chr(c) for c in range(0x20, 0x7F))
+
+
+class _TextParser(HTMLParser):
+    """Collects the characters of the text of an HTML page.
+
+    Besides the text nodes, the values of the attributes shown to the users
+    are collected too, such as the alt text of the images and the data-text
+    attribute, typed by the scripts.
+    """
+
+    _text_attributes = {"alt", "title", "placeholder", "aria-label", "data-text"}
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.characters: set[str] = set()
+        self._skip = 0
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag in ("script", "style"):
+            self._skip += 1
+
+        for name, value in attrs:
+            if name in self._text_attributes and value:
+                self.characters.update(value)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in ("script", "style") and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip:
+            self.characters.update(data)
+
+
+class FontSubsetter:
+    """Subsets the website fonts to the characters used by its pages.
+
+    The characters are collected from the text of the HTML files in the website
+    folder, together with the printable ASCII characters and the extra
+    characters listed in the settings. Each font is subset to them and saved as
+    WOFF2, named after the hash of its content. The subsets are recorded in a
+    font manifest, used by the AssetPipeline to rewrite the font URLs of the
+    stylesheets. If fontTools is not installed, the full fonts are used.
+    """
+
+    _settings: Settings
+    _cache: BuildManifest | None
+
+    def __init__(self, settings_path: str = "settings.toml") -> None:
+        """Create a new FontSubsetter instance.
+
+        Args:
+            settings_path (str, optional): Settings path. Defaults to "settings.toml".
+        """
+        self._settings = Settings.from_toml(
+            settings_path, self.__class__.__name__, {"public_path": "../public_html/"}
+        )
+
+        cache_path = self._settings.get("cache_path", "")
+        self._cache = BuildManifest(cache_path) if cache_path else None
+
+    @property
+    def manifest_path(self) -> str:
+        """Get the path of the font manifest, kept out of the deployed folder."""
+        return self._settings.get("manifest_path", ".cache/font-manifest.json")
+
+    @property
+    def fonts(self) -> dict[str, str]:
+        """Get the subset of each font, as saved by the last build."""
+        try:
+            with open(self.manifest_path, "r") as f:
+                return ujson.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @property
+    def _flavor(self) -> str:
+        # WOFF2 needs brotli, WOFF only zlib
+        return "woff2" if brotli is not None else "woff"
+
+    def _used_characters(self) -> str:
+        """Get the characters of the text of the website pages.
+
+        Returns:
+            str: sorted characters.
+        """
+        characters = set(PRINTABLE_ASCII)
+        characters.update(self._settings.get("extra_characters", ""))
+
+        for folder, _, filenames in os.walk(self._settings.public_path):
+            for filename in filenames:
+                if not filename.endswith(".html"):
+                    continue
+
+                parser = _TextParser()
+                with open(os.path.join(folder, filename), "r", encoding="utf-8") as f:
+                    parser.feed(f.read())
+                parser.close()
+                characters.update(parser.characters)
+
+        # control characters, such as line breaks, are not drawn
+        return "".join(sorted(c for c in characters if unicodedata.category(c) != "Cc"))
+
+    def build(self) -> bool:
+        """Subset all the fonts and save the font manifest.
+
+        Returns:
+            bool: True if any subset changed since the last build.
+        """
+        if subset is None:
+            logging.info("fontTools is not installed, fonts are not subset.")
+            manifest = {}
+        else:
+            if brotli is None:
+                logging.info("brotli is not installed, fonts are saved as WOFF.")
+
+            characters = self._used_characters()
+            logging.info("Pages use %d characters.", len(characters))
+            manifest = {
+                font: self._subset_font(font, characters)
+                for font in self._settings.get("fonts", [])
+            }
+
+        if self._cache is not None:
+            self._cache.save()
+
+        changed = manifest != self.fonts
+        if changed:
+            folder = os.path.dirname(self.manifest_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+
+            temp_path = f"{self.manifest_path}.tmp"
+            with open(temp_path, "w") as f:
+                ujson.dump(
+                    manifest, f, indent=2, sort_keys=True, escape_forward_slashes=False
+                )
+            os.replace(temp_path, self.manifest_path)
+
+        return changed
+
+    def _subset_font(self, font: str, characters: str) -> str:
+        """Subset a font, unless it is cached.
+
+        Args:
+            font (str): font path, relative to the website folder.
+            characters (str): characters kept in the subset.
+
+        Returns:
+            str: subset path, relative to the website folder.
+        """
+        path = os.path.join(self._settings.public_path, font)
+        options = {
+            "source": hash_file(path),
+            "characters": hash_bytes(characters.encode("utf-8")),
+            "flavor": self._flavor,
+        }
+
+        previous = self._cache.get(font) if self._cache is not None else None
+        if (
+            previous is not None
+            and self._cache.is_unchanged(font, **options)  # type: ignore
+            and os.path.exists(
+                os.path.join(self._settings.public_path, previous["subset"])
+            )
+        ):
+            logging.info("Subset of %s is unchanged.", font)
+            return previous["subset"]
+
+        subset_options = subset.Options()  # type: ignore
+        subset_options.flavor = self._flavor
+        subsetter = subset.Subsetter(subset_options)  # type: ignore
+        subsetter.populate(text=characters)
+
+        font_file = subset.load_font(path, subset_options)  # type: ignore
+        subsetter.subset(font_file)
+        buffer = io.BytesIO()
+        subset.save_font(font_file, buffer, subset_options)  # type: ignore
+        font_file.close()
+        data = buffer.getvalue()
+
+        stem = os.path.splitext(font)[0]
+        subset_name = f"{stem}.{hash_bytes(data)[:HASH_LENGTH]}.{self._flavor}"
+        subset_path = os.path.join(self._settings.public_path, subset_name)
+        temp_path = f"{subset_path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, subset_path)
+        logging.info(
+            "Wrote %s (%d bytes, %d for the full font).",
+            subset_name,
+            len(data),
+            os.path.getsize(path),
+        )
+
+        # the subset for the previous characters is no longer used
+        if previous is not None and previous["subset"] != subset_name:
+            old_path = os.path.join(self._settings.public_path, previous["subset"])
+            if os.path.exists(old_path):
+                logging.info("Removing stale subset %s", previous["subset"])
+                os.remove(old_path)
+
+        if self._cache is not None:
+            self._cache.update(font, **options, subset=subset_name)
+        return subset_name
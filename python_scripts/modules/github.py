@@ -3,46 +3,157 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Callable
+import threading
+from typing import Any
 
 import requests
+import requests.adapters
 
+from modules import graphql
+from modules.cache import ResponseCache
+from modules.ratelimit import RateLimiter
 from modules.repository import Repository
 
 
-def check_credentials_decorator(method: Callable) -> Callable:
-    """Credentials decorator for GitHub class methods.
-
-    When this method is called, it will check if the credentials are still valid.
-    If not, it will raise an exception.
-
-    Args:
-        method (callable): method of the GitHub class.
-    """
-
-    def inner(*args) -> Any:
-        if not args[0].test_credentials():
-            raise Exception("Invalid credentials")
-        return method(*args)
-
-    return inner
-
-
 class GitHub:
     """GitHub API wrapper class."""
 
-    def __init__(self, username: str, token: str):
+    _session: requests.Session
+
+    def __init__(
+        self,
+        username: str,
+        token: str,
+        pool_size: int = 10,
+        timeout: float = 10.0,
+        cache: ResponseCache | None = None,
+        graphql_url: str = "https://api.github.com/graphql",
+        rate_limiter: RateLimiter | None = None,
+    ):
         """Initialize the GitHub class.
 
         Args:
             username (str): GitHub username.
             token (str): GitHub token.
+            pool_size (int, optional): Number of pooled keep-alive connections.
+                Should be at least the number of concurrent workers.
+                Defaults to 10.
+            timeout (float, optional): Timeout in seconds for each request.
+                Defaults to 10.0.
+            cache (ResponseCache | None, optional): Cache used to send
+                conditional requests. Defaults to None (no cache).
+            graphql_url (str, optional): Endpoint of the GraphQL API.
+                Defaults to "https://api.github.com/graphql".
+            rate_limiter (RateLimiter | None, optional): Limiter pacing and
+                retrying the requests. Defaults to a RateLimiter with the default
+                settings.
         """
         logging.info("Initializing %s...", self.__class__.__name__)
         self._username = username
         self._token = token
-        self._credentials_tested = False
+        self._timeout = timeout
+        self._cache = cache
+        self._graphql_url = graphql_url
+        self._rate_limiter = rate_limiter or RateLimiter()
+        self._credentials_valid: bool | None = None
+        self._credentials_lock = threading.Lock()
+        self._listings: dict[bool, list[dict]] = {}
+        self._listings_lock = threading.Lock()
         self._requests_count = 0
+        self._requests_count_lock = threading.Lock()
+        self._session = self._create_session(pool_size)
+
+    def __enter__(self) -> GitHub:
+        """Enter the context manager.
+
+        Returns:
+            GitHub: This instance.
+        """
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        """Exit the context manager, closing the HTTP session."""
+        self.close()
+
+    def _create_session(self, pool_size: int) -> requests.Session:
+        """Create the pooled HTTP session used for all the API requests.
+
+        Args:
+            pool_size (int): Number of pooled connections.
+
+        Returns:
+            requests.Session
+        """
+        session = requests.Session()
+        session.headers.update(
+            {
+                "Authorization": f"Bearer {self._token}",
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+            }
+        )
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_block=True,
+        )
+        session.mount("https://", adapter)
+        return session
+
+    def close(self) -> None:
+        """Close the HTTP session and its pooled connections."""
+        logging.info("Closing %s session", self.__class__.__name__)
+        self._session.close()
+        if self._cache is not None:
+            self._cache.prune()
+
+    def _send(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Send a request through the rate limiter, retrying transient failures.
+
+        Args:
+            method (str): HTTP method.
+            url (str): URL to make the request to.
+            **kwargs (Any): Arguments passed to the session request.
+
+        Returns:
+            requests.Response: Response object.
+
+        Raises:
+            requests.ConnectionError: If the connection still fails after all
+                the retries.
+            requests.Timeout: If the request still times out after all the
+                retries.
+            requests.HTTPError: If the request is still rate limited or failing
+                after all the retries.
+        """
+        attempt = 0
+        while True:
+            self._rate_limiter.acquire()
+            try:
+                response = self._session.request(
+                    method, url, timeout=self._timeout, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if not self._rate_limiter.wait_before_retry(attempt):
+                    raise
+                attempt += 1
+                continue
+
+            with self._requests_count_lock:
+                self._requests_count += 1
+            self._rate_limiter.update(response)
+
+            if not self._rate_limiter.wait_before_retry(attempt, response):
+                break
+            attempt += 1
+
+        if self._rate_limiter.is_transient(response):
+            raise requests.HTTPError(
+                f"{response.status_code} {response.reason} for url: {response.url}",
+                response=response,
+            )
+
+        return response
 
     def _make_authorized_request(
         self, url: str, params: dict | None = None
@@ -56,32 +167,90 @@ class GitHub:
         Returns:
             requests.Response: Response object.
         """
-        headers = {"Authorization": f"Bearer {self._token}"}
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code != 200:
+        entry = self._cache.get(url, params) if self._cache is not None else None
+        response = self._send(
+            "GET",
+            url,
+            params=params,
+            headers=ResponseCache.conditional_headers(entry),
+        )
+
+        if response.status_code == 304 and entry is not None:
+            response = self._cache.revalidated(url, params, entry, response)
+        elif response.status_code == 200 and self._cache is not None:
+            self._cache.store(url, params, response)
+        elif response.status_code != 200:
             logging.warning(
                 "GitHub API request failed: HTTP %d - %s",
                 response.status_code,
                 response.text,
             )
-        self._requests_count += 1
         return response
 
+    def _make_authorized_query(self, query: str, variables: dict) -> dict:
+        """Make an authorized query to the GitHub GraphQL API.
+
+        Args:
+            query (str): GraphQL query.
+            variables (dict): Query variables.
+
+        Returns:
+            dict: The "data" field of the response.
+
+        Raises:
+            Exception: If the query failed.
+        """
+        response = self._send(
+            "POST",
+            self._graphql_url,
+            json={"query": query, "variables": variables},
+        )
+
+        if response.status_code != 200:
+            raise Exception(
+                f"GitHub GraphQL query failed: HTTP {response.status_code} - "
+                f"{response.text}"
+            )
+
+        json_data = response.json()
+        if json_data.get("errors"):
+            raise Exception(f"GitHub GraphQL query failed: {json_data['errors']}")
+
+        return json_data["data"]
+
     def test_credentials(self) -> bool:
         """Test the credentials.
 
+        The credentials are only tested once, the result is then reused.
+
         Returns:
             bool: True if the credentials are valid, False otherwise.
         """
-        if self._credentials_tested:
-            return True
+        with self._credentials_lock:
+            if self._credentials_valid is None:
+                r = self._make_authorized_request("https://api.github.com")
+                self._credentials_valid = r.status_code == 200
+
+            return self._credentials_valid
 
-        r = self._make_authorized_request("https://api.github.com")
-        self._credentials_tested = r.status_code == 200
-        return r.status_code == 200
+    def _check_credentials(self) -> None:
+        """Check that the credentials are valid.
+
+        Raises:
+            Exception: If the credentials are not valid.
+        """
+        if not self.test_credentials():
+            raise Exception("Invalid credentials")
 
-    @check_credentials_decorator
     def _get_all_repos(self, skip_private: bool) -> list[dict]:
+        with self._listings_lock:
+            if skip_private not in self._listings:
+                self._listings[skip_private] = self._list_repos(skip_private)
+
+            return self._listings[skip_private]
+
+    def _list_repos(self, skip_private: bool) -> list[dict]:
+        self._check_credentials()
         url = f"https://api.github.com/users/{self._username}/repos"
 
         if skip_private:
@@ -99,31 +268,46 @@ class GitHub:
         }
 
         while True:
-            r = self._make_authorized_request(url, params=params)
-            if not r.json():
+            page = self._make_authorized_request(url, params=params).json()
+            if not page:
                 return repos_json
 
-            repos_json += r.json()
+            repos_json += page
             params["page"] += 1
 
-    @check_credentials_decorator
+    def _find_listed_repo(self, name: str) -> dict | None:
+        with self._listings_lock:
+            for listing in self._listings.values():
+                for json_data in listing:
+                    if json_data["name"] == name:
+                        return json_data
+
+        return None
+
     def _get_repo(
         self,
         user: str,
         name: str,
     ) -> Repository:
-        url = f"https://api.github.com/repos/{user}/{name}"
-        r = self._make_authorized_request(url)
-        json_data = r.json()
+        json_data = None
+        if user == self._username:
+            json_data = self._find_listed_repo(name)
+
+        if json_data is None:
+            self._check_credentials()
+            url = f"https://api.github.com/repos/{user}/{name}"
+            json_data = self._make_authorized_request(url).json()
 
+        return self._get_repo_from_json(json_data)
+
+    def _get_repo_from_json(self, json_data: dict) -> Repository:
         languages = self._get_repo_languages(json_data["languages_url"])
         commits_count = self._get_repo_commits_count(json_data["contributors_url"])
 
         return Repository.from_json(
-            r.json(), languages=languages, commits_count=commits_count
+            json_data, languages=languages, commits_count=commits_count
         )
 
-    @check_credentials_decorator
     def _get_repo_languages(self, url: str) -> list[dict[str, float]]:
         r = self._make_authorized_request(url)
         languages = [
@@ -131,7 +315,6 @@ class GitHub:
         ]
         return sorted(languages, key=lambda x: x["size"], reverse=True)
 
-    @check_credentials_decorator
     def _get_repo_commits_count(self, url: str) -> int:
         r = self._make_authorized_request(url)
         json_data = r.json()
@@ -143,6 +326,53 @@ class GitHub:
 
         return user_data[0]["contributions"]
 
+    def _get_all_repos_graphql(self, skip_private: bool) -> list[Repository]:
+        user = self._make_authorized_query(
+            graphql.USER_ID_QUERY, {"login": self._username}
+        )["user"]
+
+        variables = {
+            "login": self._username,
+            "userId": user["id"],
+            "privacy": "PUBLIC" if skip_private else None,
+            "cursor": None,
+        }
+        repos = []
+
+        while True:
+            data = self._make_authorized_query(graphql.REPOSITORIES_QUERY, variables)
+            page = data["user"]["repositories"]
+            repos += [
+                Repository.from_json(
+                    graphql.node_to_json(node),
+                    languages=graphql.node_languages(node),
+                    commits_count=graphql.node_commits_count(node),
+                )
+                for node in page["nodes"]
+            ]
+
+            if not page["pageInfo"]["hasNextPage"]:
+                return repos
+
+            variables["cursor"] = page["pageInfo"]["endCursor"]
+
+    def get_repos_listing(self, skip_private: bool = False) -> list[dict]:
+        """Load the raw listing of all the repos.
+
+        The listing is requested once and then reused.
+
+        Args:
+            skip_private (bool, optional): Skip the private repos.
+                Defaults to False.
+
+        Returns:
+            list[dict]: Repos payloads as returned by the API.
+        """
+        logging.info("Getting repos listing")
+        listing = self._get_all_repos(skip_private)
+        logging.info("Loaded %s repos in listing", len(listing))
+        return listing
+
     def get_repos_urls(self, skip_private: bool = False) -> list[str]:
         """Load a list of all the repos urls.
 
@@ -187,6 +417,39 @@ class GitHub:
         logging.info("Loaded repo named %s", name)
         return repo
 
+    def get_repo_from_listing(self, json_data: dict) -> Repository:
+        """Get a repo from its payload in the repos listing.
+
+        Only the languages and the commits count are requested.
+
+        Args:
+            json_data (dict): Repo payload, as returned by get_repos_listing.
+
+        Returns:
+            Repository
+        """
+        logging.info("Getting repo named %s", json_data["name"])
+        repo = self._get_repo_from_json(json_data)
+        logging.info("Loaded repo named %s", json_data["name"])
+        return repo
+
+    def get_repos_graphql(self, skip_private: bool = False) -> list[Repository]:
+        """Load all the repos, with languages and commits, via the GraphQL API.
+
+        Up to 100 repos are loaded with each query.
+
+        Args:
+            skip_private (bool, optional): Skip the private repos.
+                Defaults to False.
+
+        Returns:
+            list[Repository]
+        """
+        logging.info("Getting repos via GraphQL")
+        repos = self._get_all_repos_graphql(skip_private)
+        logging.info("Loaded %s repos", len(repos))
+        return repos
+
     @property
     def requests_count(self) -> int:
         """Return the number of requests made to the GitHub API.
@@ -195,3 +458,24 @@ class GitHub:
             int
         """
         return self._requests_count
+
+    @property
+    def cache_stats(self) -> dict[str, int] | None:
+        """Return the hits, misses and bytes saved by the response cache.
+
+        Returns:
+            dict[str, int] | None: None if the cache is disabled.
+        """
+        if self._cache is None:
+            return None
+
+        return self._cache.stats
+
+    @property
+    def rate_limit_stats(self) -> dict[str, int | float | None]:
+        """Return the remaining rate limit budget and the retries made.
+
+        Returns:
+            dict[str, int | float | None]
+        """
+        return self._rate_limiter.stats
@@ -0,0 +1,143 @@
+"""GraphQL queries used by the GitHub batch backend."""
+
+from __future__ import annotations
+
+USER_ID_QUERY = """
+query($login: String!) {
+  user(login: $login) {
+    id
+  }
+}
+"""
+
+REPOSITORIES_QUERY = """
+query(
+  $login: String!,
+  $userId: ID!,
+  $privacy: RepositoryPrivacy,
+  $cursor: String
+) {
+  user(login: $login) {
+    repositories(
+      first: 100,
+      after: $cursor,
+      privacy: $privacy,
+      ownerAffiliations: OWNER,
+      orderBy: {field: NAME, direction: ASC}
+    ) {
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+      nodes {
+        databaseId
+        name
+        description
+        url
+        homepageUrl
+        isPrivate
+        stargazerCount
+        forkCount
+        diskUsage
+        createdAt
+        updatedAt
+        pushedAt
+        issues(states: OPEN) {
+          totalCount
+        }
+        pullRequests(states: OPEN) {
+          totalCount
+        }
+        repositoryTopics(first: 100) {
+          nodes {
+            topic {
+              name
+            }
+          }
+        }
+        languages(first: 100, orderBy: {field: SIZE, direction: DESC}) {
+          edges {
+            size
+            node {
+              name
+            }
+          }
+        }
+        defaultBranchRef {
+          target {
+            ... on Commit {
+              history(author: {id: $userId}) {
+                totalCount
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def node_to_json(node: dict) -> dict:
+    """Convert a repository node to the payload returned by the REST API.
+
+    The legacy REST watchers fields are equal to the stargazers count.
+
+    Args:
+        node (dict): Repository node from the REPOSITORIES_QUERY.
+
+    Returns:
+        dict: REST-like repository payload.
+    """
+    open_issues = node["issues"]["totalCount"] + node["pullRequests"]["totalCount"]
+    return {
+        "name": node["name"],
+        "description": node["description"],
+        "html_url": node["url"],
+        "topics": [t["topic"]["name"] for t in node["repositoryTopics"]["nodes"]],
+        "homepage": node["homepageUrl"],
+        "id": node["databaseId"],
+        "private": node["isPrivate"],
+        "stargazers_count": node["stargazerCount"],
+        "watchers_count": node["stargazerCount"],
+        "created_at": node["createdAt"],
+        "updated_at": node["updatedAt"],
+        "pushed_at": node["pushedAt"],
+        "size": node["diskUsage"],
+        "forks_count": node["forkCount"],
+        "open_issues_count": open_issues,
+        "watchers": node["stargazerCount"],
+    }
+
+
+def node_languages(node: dict) -> list[dict]:
+    """Get the languages of a repository node, sorted by size.
+
+    Args:
+        node (dict): Repository node from the REPOSITORIES_QUERY.
+
+    Returns:
+        list[dict]: Languages in the same format as the REST backend.
+    """
+    languages = [
+        {"language": edge["node"]["name"], "size": edge["size"]}
+        for edge in node["languages"]["edges"]
+    ]
+    return sorted(languages, key=lambda x: x["size"], reverse=True)
+
+
+def node_commits_count(node: dict) -> int:
+    """Get the number of commits of the owner in a repository node.
+
+    Args:
+        node (dict): Repository node from the REPOSITORIES_QUERY.
+
+    Returns:
+        int: Commits on the default branch, 0 for empty repositories.
+    """
+    branch = node["defaultBranchRef"]
+    if branch is None or "history" not in branch["target"]:
+        return 0
+
+    return branch["target"]["history"]["totalCount"]
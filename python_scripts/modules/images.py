@@ -0,0 +1,188 @@
+"""Image pipeline, writing resized variants of the website images in modern formats."""
+
+from __future__ import annotations
+
+import io
+import logging
+import os
+
+import ujson
+
+from modules.manifest import BuildManifest, hash_bytes, hash_file
+from modules.settings import Settings
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow is optional, the original images are used without it
+    Image = features = None
+
+HASH_LENGTH = 8
+
+
+class ImagePipeline:
+    """Writes resized, metadata-free variants of the images in modern formats.
+
+    Each image listed in the settings is resized to each of the configured
+    widths, not larger than the image itself, and encoded in each configured
+    format supported by the local Pillow build. The variants are named after
+    the hash of their content, and recorded in an image manifest that the
+    Renderer uses to build srcset attributes. If Pillow is not installed, no
+    variant is written and the templates fall back to the original images.
+    """
+
+    _settings: Settings
+    _cache: BuildManifest | None
+
+    def __init__(self, settings_path: str = "settings.toml") -> None:
+        """Create a new ImagePipeline instance.
+
+        Args:
+            settings_path (str, optional): Settings path. Defaults to "settings.toml".
+        """
+        self._settings = Settings.from_toml(
+            settings_path, self.__class__.__name__, {"public_path": "../public_html/"}
+        )
+
+        cache_path = self._settings.get("cache_path", "")
+        self._cache = BuildManifest(cache_path) if cache_path else None
+
+    @property
+    def manifest_path(self) -> str:
+        """Get the path of the image manifest, kept out of the deployed folder."""
+        return self._settings.get("manifest_path", ".cache/image-manifest.json")
+
+    @property
+    def formats(self) -> list[str]:
+        """Get the configured formats that the local Pillow build can encode."""
+        if Image is None:
+            return []
+
+        formats = self._settings.get("formats", ["avif", "webp"])
+        return [f for f in formats if features.check(f)]  # type: ignore
+
+    def build(self) -> dict[str, dict[str, list]]:
+        """Write the variants of all the images and save the image manifest.
+
+        Returns:
+            dict[str, dict[str, list]]: path and width of the variants of each
+                image, keyed by image and format.
+        """
+        if Image is None:
+            logging.info("Pillow is not installed, images are not optimised.")
+
+        manifest = {}
+        for name in self._settings.get("images", []):
+            manifest[name] = self._build_image(name)
+
+        if self._cache is not None:
+            self._cache.save()
+
+        folder = os.path.dirname(self.manifest_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w") as f:
+            ujson.dump(
+                manifest, f, indent=2, sort_keys=True, escape_forward_slashes=False
+            )
+        os.replace(temp_path, self.manifest_path)
+
+        return manifest
+
+    def _build_image(self, name: str) -> dict[str, list]:
+        """Write the variants of an image, unless they are cached.
+
+        Args:
+            name (str): image path, relative to the website folder.
+
+        Returns:
+            dict[str, list]: path and width of the variants, keyed by format.
+        """
+        path = os.path.join(self._settings.public_path, name)
+        options = {
+            "source": hash_file(path),
+            "formats": self.formats,
+            "widths": sorted(self._settings.get("widths", [256, 512])),
+            "quality": int(self._settings.get("quality", 80)),
+        }
+
+        previous = self._cache.get(name) if self._cache is not None else None
+        if (
+            previous is not None
+            and self._cache.is_unchanged(name, **options)  # type: ignore
+            and all(
+                os.path.exists(os.path.join(self._settings.public_path, v))
+                for variants in previous["variants"].values()
+                for v, _ in variants
+            )
+        ):
+            logging.info("Variants of %s are unchanged.", name)
+            return previous["variants"]
+
+        variants = self._write_variants(name, options) if options["formats"] else {}
+
+        # variants of the previous version of the image are no longer used
+        if previous is not None:
+            current = {v for vs in variants.values() for v, _ in vs}
+            for old_variants in previous["variants"].values():
+                for variant, _ in old_variants:
+                    old_path = os.path.join(self._settings.public_path, variant)
+                    if variant not in current and os.path.exists(old_path):
+                        logging.info("Removing stale variant %s", variant)
+                        os.remove(old_path)
+
+        if self._cache is not None:
+            self._cache.update(name, **options, variants=variants)
+        return variants
+
+    def _write_variants(self, name: str, options: dict) -> dict[str, list]:
+        """Resize and encode an image.
+
+        Args:
+            name (str): image path, relative to the website folder.
+            options (dict): formats, widths and quality of the variants.
+
+        Returns:
+            dict[str, list]: path and width of the variants, keyed by format.
+        """
+        stem = os.path.splitext(name)[0]
+        variants: dict[str, list] = {f: [] for f in options["formats"]}
+        path = os.path.join(self._settings.public_path, name)
+        source_size = os.path.getsize(path)
+
+        with Image.open(path) as image:  # type: ignore
+            image.load()
+            # images are never enlarged
+            widths = [w for w in options["widths"] if w <= image.width] or [image.width]
+            for width in widths:
+                height = round(image.height * width / image.width)
+                resampling = Image.Resampling.LANCZOS  # type: ignore
+                resized = image.resize((width, height), resampling)
+                # metadata (EXIF, ICC profile, text chunks) is not copied
+                resized.info = {}
+
+                for image_format in options["formats"]:
+                    buffer = io.BytesIO()
+                    resized.save(
+                        buffer, format=image_format, quality=options["quality"]
+                    )
+                    data = buffer.getvalue()
+
+                    digest = hash_bytes(data)[:HASH_LENGTH]
+                    variant = f"{stem}.{digest}.{width}w.{image_format}"
+                    variant_path = os.path.join(self._settings.public_path, variant)
+                    temp_path = f"{variant_path}.tmp"
+                    with open(temp_path, "wb") as f:
+                        f.write(data)
+                    os.replace(temp_path, variant_path)
+
+                    variants[image_format].append([variant, width])
+                    logging.info(
+                        "Wrote %s (%d bytes, %d for the original).",
+                        variant,
+                        len(data),
+                        source_size,
+                    )
+
+        return variants
@@ -0,0 +1,130 @@
+"""Content-addressed build manifest, used to skip unchanged build steps."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+from typing import Any
+
+import ujson
+
+
+def hash_bytes(data: bytes) -> str:
+    """Get the SHA256 hash of some bytes.
+
+    Args:
+        data (bytes): data to hash.
+
+    Returns:
+        str: hex digest.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str | None:
+    """Get the SHA256 hash of a file, reading it in chunks.
+
+    Args:
+        path (str): file path.
+        chunk_size (int, optional): bytes read at once. Defaults to 1 MB.
+
+    Returns:
+        str | None: hex digest, None if the file does not exist.
+    """
+    sha = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                sha.update(chunk)
+    except FileNotFoundError:
+        return None
+
+    return sha.hexdigest()
+
+
+class BuildManifest:
+    """Records, for each build output, the hashes it was built from.
+
+    The manifest is a JSON file mapping each output to a dict of hashes. A
+    build step can be skipped when the recorded hashes match the current ones.
+    """
+
+    _path: str
+    _entries: dict[str, dict[str, Any]]
+
+    def __init__(self, path: str) -> None:
+        """Load a manifest, or start an empty one if the file does not exist.
+
+        Args:
+            path (str): manifest file path.
+        """
+        self._path = path
+        self._changed = False
+        try:
+            with open(path, "r") as f:
+                self._entries = ujson.load(f)
+        except (FileNotFoundError, ValueError):
+            self._entries = {}
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Get the recorded entry of an output.
+
+        Args:
+            key (str): output key.
+
+        Returns:
+            dict[str, Any] | None: None if the output was never recorded.
+        """
+        return self._entries.get(key)
+
+    def is_unchanged(self, key: str, **hashes: Any) -> bool:
+        """Check whether an output was recorded with the same hashes.
+
+        Args:
+            key (str): output key.
+            **hashes (Any): current hashes, or other fingerprints such as sizes
+                and modification times, of the output and its inputs.
+
+        Returns:
+            bool: True if all the hashes match the recorded ones.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+
+        return all(entry.get(k) == v for k, v in hashes.items())
+
+    def update(self, key: str, **hashes: Any) -> None:
+        """Record the hashes of an output.
+
+        Args:
+            key (str): output key.
+            **hashes (Any): hashes, or other fingerprints, of the output and its
+                inputs.
+        """
+        if self._entries.get(key) != hashes:
+            self._entries[key] = hashes
+            self._changed = True
+
+    def save(self) -> None:
+        """Save the manifest, if it changed, replacing the file atomically."""
+        if not self._changed:
+            return
+
+        folder = os.path.dirname(self._path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        temp_path = f"{self._path}.tmp"
+        with open(temp_path, "w") as f:
+            ujson.dump(
+                self._entries,
+                f,
+                indent=2,
+                sort_keys=True,
+                escape_forward_slashes=False,
+            )
+        os.replace(temp_path, self._path)
+        self._changed = False
+        logging.debug("Saved build manifest to %s", self._path)
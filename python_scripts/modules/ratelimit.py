@@ -0,0 +1,172 @@
+"""Rate limit aware scheduling of the GitHub API requests."""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+
+import requests
+
+
+class RateLimiter:
+    """Paces the requests according to the GitHub rate limit headers.
+
+    The limiter reads X-RateLimit-Remaining, X-RateLimit-Reset and Retry-After
+    from every response. When the remaining budget runs low, the requests are
+    spread until the reset; when only the reserve is left, they wait for the
+    reset. Transient failures are retried with jittered exponential backoff.
+    """
+
+    _transient_statuses = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        reserve: int = 10,
+    ) -> None:
+        """Create a new RateLimiter instance.
+
+        Args:
+            max_retries (int, optional): Retries for each request. Defaults to 5.
+            backoff_base (float, optional): Base delay in seconds of the
+                exponential backoff. Defaults to 1.0.
+            backoff_max (float, optional): Maximum delay in seconds of the
+                exponential backoff. Defaults to 60.0.
+            reserve (int, optional): Requests kept aside before waiting for the
+                rate limit reset. Defaults to 10.
+        """
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._reserve = reserve
+        self._lock = threading.Lock()
+        self._limit: int | None = None
+        self._remaining: int | None = None
+        self._reset: float | None = None
+        self._next_slot = 0.0
+        self._retries = 0
+        self._waited = 0.0
+        self._stopped = threading.Event()
+
+    def _sleep(self, delay: float) -> None:
+        if delay > 0:
+            with self._lock:
+                self._waited += delay
+            # woken early by stop
+            self._stopped.wait(delay)
+
+        if self._stopped.is_set():
+            raise RuntimeError("Rate limiter stopped, request not sent")
+
+    def stop(self) -> None:
+        """Wake the waiting requests and make every further request fail.
+
+        Used to stop the workers still running after a failure or an interrupt:
+        acquire and wait_before_retry raise a RuntimeError from then on.
+        """
+        self._stopped.set()
+
+    def acquire(self) -> None:
+        """Wait until the next request can be sent without exceeding the budget."""
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_slot)
+
+            if self._remaining is not None and self._reset is not None:
+                to_reset = max(0.0, self._reset - now)
+                spare = self._remaining - self._reserve
+
+                if spare <= 0:
+                    slot = max(slot, self._reset)
+                elif self._limit and self._remaining < self._limit / 10:
+                    self._next_slot = slot + to_reset / spare
+
+                # optimistically account for the request being sent
+                self._remaining = max(0, self._remaining - 1)
+
+        if slot - now > 1:
+            logging.warning("Rate limit budget low, waiting %.1f s", slot - now)
+        self._sleep(slot - now)
+
+    def update(self, response: requests.Response) -> None:
+        """Update the budget from the rate limit headers of a response.
+
+        Args:
+            response (requests.Response): Response sent by the API.
+        """
+        headers = response.headers
+        with self._lock:
+            if "X-RateLimit-Limit" in headers:
+                self._limit = int(headers["X-RateLimit-Limit"])
+            if "X-RateLimit-Remaining" in headers:
+                self._remaining = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Reset" in headers:
+                self._reset = float(headers["X-RateLimit-Reset"])
+
+    def is_transient(self, response: requests.Response) -> bool:
+        """Check whether a failed response is worth retrying.
+
+        Args:
+            response (requests.Response): Response sent by the API.
+
+        Returns:
+            bool: True for rate limited and server error responses.
+        """
+        if response.status_code in self._transient_statuses:
+            return True
+
+        return response.status_code == 403 and (
+            "Retry-After" in response.headers
+            or response.headers.get("X-RateLimit-Remaining") == "0"
+        )
+
+    def wait_before_retry(
+        self, attempt: int, response: requests.Response | None = None
+    ) -> bool:
+        """Wait before retrying a failed request.
+
+        Args:
+            attempt (int): Number of retries already made for the request.
+            response (requests.Response | None, optional): Failed response,
+                None if the request raised a connection error. Defaults to None.
+
+        Returns:
+            bool: True if the request should be retried, False otherwise.
+        """
+        if attempt >= self._max_retries:
+            return False
+        if response is not None and not self.is_transient(response):
+            return False
+
+        delay = random.uniform(
+            0, min(self._backoff_max, self._backoff_base * 2**attempt)
+        )
+        if response is not None:
+            if "Retry-After" in response.headers:
+                delay = float(response.headers["Retry-After"])
+            elif response.headers.get("X-RateLimit-Remaining") == "0":
+                reset = float(response.headers.get("X-RateLimit-Reset", 0))
+                delay = max(delay, reset - time.time())
+
+        with self._lock:
+            self._retries += 1
+
+        logging.warning("Retrying request in %.1f s (attempt %d)", delay, attempt + 1)
+        self._sleep(delay)
+        return True
+
+    @property
+    def stats(self) -> dict[str, int | float | None]:
+        """Get the remaining budget, the retries and the time spent waiting."""
+        with self._lock:
+            return {
+                "limit": self._limit,
+                "remaining": self._remaining,
+                "reset": self._reset,
+                "retries": self._retries,
+                "waited": round(self._waited, 3),
+            }
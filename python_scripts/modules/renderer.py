@@ -2,69 +2,561 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
+import os
+import reprlib
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Iterable
 
 import jinja2
+import jinja2.meta
 import jinja2.sandbox
+import ujson
 
+from modules.manifest import BuildManifest, hash_bytes, hash_file
+from modules.repository import Repository
 from modules.settings import Settings
 
+# size-capped representation of the template data, used in the debug log
+_data_repr = reprlib.Repr()
+_data_repr.maxlevel = 3
+_data_repr.maxdict = 6
+_data_repr.maxlist = 3
+_data_repr.maxstring = 80
+_data_repr.maxother = 80
+
+
+def _json_default(value: Any) -> Any:
+    # deterministic representation of the objects passed to the templates
+    if isinstance(value, Repository):
+        return value.as_dict
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
 
 class Renderer:
     """This class is responsible for rendering the templates."""
 
     _settings: Settings
-    _environment: jinja2.sandbox.SandboxedEnvironment
+    _environment: jinja2.Environment
+    _manifest: BuildManifest | None
     _list_container: str = "output"
 
-    def __init__(self, settings_path="settings.toml") -> None:
+    def __init__(
+        self, settings_path: str = "settings.toml", manifest: bool = True
+    ) -> None:
         """Create a new Renderer instance.
 
         Args:
             settings_path (str, optional): Settings path. Defaults to "settings.toml".
+            manifest (bool, optional): If False, the build manifest is not used.
+                Defaults to True.
         """
+        self._settings_path = settings_path
         self._settings = Settings.from_toml(settings_path, self.__class__.__name__)
-        self._environment = jinja2.sandbox.SandboxedEnvironment(
-            loader=jinja2.FileSystemLoader(self._settings.templates_path)
+
+        if self._settings.get("sandboxed", True):
+            environment_class = jinja2.sandbox.SandboxedEnvironment
+        else:
+            # only for trusted, first-party templates
+            environment_class = jinja2.Environment
+
+        self._environment = environment_class(
+            loader=jinja2.FileSystemLoader(self._settings.templates_path),
+            bytecode_cache=self._create_bytecode_cache(),
+        )
+
+        manifest_path = self._settings.get("manifest_path", "") if manifest else ""
+        self._manifest = BuildManifest(manifest_path) if manifest_path else None
+        self._template_hashes: dict[str, str] = {}
+
+        self._assets = self._load_manifest(
+            "asset_manifest_path", ".cache/asset-manifest.json"
+        )
+        self._images = self._load_manifest(
+            "image_manifest_path", ".cache/image-manifest.json"
+        )
+        self._environment.globals["asset"] = self.asset
+        self._environment.globals["srcset"] = self.srcset
+        self._environment.globals["image_formats"] = self.image_formats
+
+    def _load_manifest(self, setting: str, default: str = "") -> dict[str, Any]:
+        manifest_path = self._settings.get(setting, default)
+        if not manifest_path:
+            return {}
+
+        try:
+            with open(manifest_path, "r") as f:
+                return ujson.load(f)
+        except FileNotFoundError:
+            logging.warning("Manifest %s not found.", manifest_path)
+            return {}
+
+    def asset(self, name: str) -> str:
+        """Get the content-hashed name of an asset, exposed to the templates.
+
+        Args:
+            name (str): asset name, as listed in the asset manifest.
+
+        Returns:
+            str: hashed name, or the name itself if it is not in the manifest.
+        """
+        return self._assets.get(name, name)
+
+    def image_formats(self, name: str) -> list[str]:
+        """Get the formats of the variants of an image, exposed to the templates.
+
+        Args:
+            name (str): image name, as listed in the image manifest.
+
+        Returns:
+            list[str]: formats, empty if the image has no variants.
+        """
+        return [f for f, variants in self._images.get(name, {}).items() if variants]
+
+    def srcset(self, name: str, image_format: str) -> str:
+        """Get the srcset attribute of an image, exposed to the templates.
+
+        Args:
+            name (str): image name, as listed in the image manifest.
+            image_format (str): format of the variants.
+
+        Returns:
+            str: variant paths and widths, or the name itself if the image has
+                no variants in that format.
+        """
+        variants = self._images.get(name, {}).get(image_format)
+        if not variants:
+            return name
+
+        return ", ".join(f"{path} {width}w" for path, width in variants)
+
+    def _create_bytecode_cache(self) -> jinja2.BytecodeCache | None:
+        cache_path = self._settings.get("bytecode_cache_path", "")
+        if not cache_path:
+            return None
+
+        os.makedirs(cache_path, exist_ok=True)
+        return jinja2.FileSystemBytecodeCache(cache_path)
+
+    def precompile(self) -> int:
+        """Compile all the templates ahead of time, filling the bytecode cache.
+
+        Returns:
+            int: number of compiled templates.
+        """
+        start = time.perf_counter()
+        templates = self._environment.list_templates()
+        for template_name in templates:
+            self._environment.get_template(template_name)
+
+        logging.info(
+            "Precompiled %d templates in %.2f ms.",
+            len(templates),
+            (time.perf_counter() - start) * 1000,
         )
+        return len(templates)
+
+    def _template_references(self, template_name: str, source: str) -> list[str]:
+        """Get the names of the templates extended or included by a template.
+
+        The references are recorded in the build manifest, keyed by the hash of
+        the source, so that a template is only parsed when it changes.
+
+        Args:
+            template_name (str): The name of the template
+            source (str): template source.
+
+        Returns:
+            list[str]
+        """
+        key = f"template:{template_name}"
+        source_hash = hash_bytes(source.encode("utf-8"))
+        if self._manifest is not None and self._manifest.is_unchanged(
+            key, source=source_hash
+        ):
+            return self._manifest.get(key)["references"]  # type: ignore
+
+        # dynamic references (None) cannot be tracked
+        references = sorted(
+            r
+            for r in jinja2.meta.find_referenced_templates(
+                self._environment.parse(source)
+            )
+            if r is not None
+        )
+        if self._manifest is not None:
+            self._manifest.update(key, source=source_hash, references=references)
+        return references
+
+    def _template_sources(self, template_name: str) -> dict[str, str]:
+        """Get the sources of a template and of all the templates it references.
+
+        Args:
+            template_name (str): The name of the template
+
+        Returns:
+            dict[str, str]: sources, keyed by template name.
+        """
+        sources = {}
+        pending = [template_name]
+        while pending:
+            name = pending.pop()
+            if name in sources:
+                continue
+
+            source, _, _ = self._environment.loader.get_source(  # type: ignore
+                self._environment, name
+            )
+            sources[name] = source
+            pending.extend(self._template_references(name, source))
+
+        return sources
+
+    def _template_hash(self, template_name: str) -> str:
+        """Get the hash of a template, including extended and included templates.
+
+        Args:
+            template_name (str): The name of the template
+
+        Returns:
+            str
+        """
+        if template_name not in self._template_hashes:
+            sources = self._template_sources(template_name)
+            serialised = json.dumps(sources, sort_keys=True)
+            self._template_hashes[template_name] = hash_bytes(serialised.encode())
+
+        return self._template_hashes[template_name]
+
+    @staticmethod
+    def _data_hash(data: dict) -> str:
+        """Get a deterministic hash of the data passed to a template.
+
+        Args:
+            data (dict): template data.
+
+        Returns:
+            str
+        """
+        serialised = json.dumps(data, sort_keys=True, default=_json_default)
+        return hash_bytes(serialised.encode())
+
+    def _job_hashes(
+        self, template_name: str, data: dict, output_path: str | None
+    ) -> dict[str, str | None] | None:
+        """Get the hashes of a render, None if no manifest is configured.
+
+        Args:
+            template_name (str): The name of the template
+            data (dict): template data.
+            output_path (str | None): The path of the rendered page.
+
+        Returns:
+            dict[str, str | None] | None: template, data and current output hashes.
+        """
+        if not output_path or self._manifest is None:
+            return None
+
+        return {
+            "template": self._template_hash(template_name),
+            # the hashed asset and image names change the page, but are not in
+            # its data
+            "data": self._data_hash(
+                {"data": data, "assets": self._assets, "images": self._images}
+            ),
+            "output": hash_file(output_path),
+        }
+
+    def _is_unchanged(self, output_path: str | None, hashes: dict | None) -> bool:
+        if hashes is None or self._manifest is None:
+            return False
+        return self._manifest.is_unchanged(output_path, **hashes)  # type: ignore
+
+    def _load_template(self, template_name: str) -> jinja2.Template:
+        start = time.perf_counter()
+        template = self._environment.get_template(template_name)
+        template_path = self._settings.templates_path + template_name
+        load_time = time.perf_counter() - start
+        logging.info(
+            "Template loaded from %s in %.2f ms.", template_path, load_time * 1000
+        )
+        return template
+
+    def _render(self, template_name: str, data: dict) -> str:
+        """Render a template to a string.
+
+        Args:
+            template_name (str): The name of the template
+            data (dict): template data.
+
+        Returns:
+            str: rendered page
+        """
+        template = self._load_template(template_name)
+
+        start = time.perf_counter()
+        content = template.render(**data)
+        logging.info(
+            "Rendered file %s in %.2f ms.",
+            template_name,
+            (time.perf_counter() - start) * 1000,
+        )
+        return content
+
+    def _stream(
+        self,
+        template_name: str,
+        data: dict,
+        output_path: str,
+        previous_hash: str | None,
+        return_content: bool = False,
+    ) -> tuple[str, str | None]:
+        """Render a template to file, one chunk at a time.
+
+        The chunks are written to a temporary file, which is moved in place
+        unless its content is the same as the current output, and removed if
+        the rendering fails.
+
+        Args:
+            template_name (str): The name of the template
+            data (dict): template data.
+            output_path (str): The path to save the rendered page.
+            previous_hash (str | None): hash of the current output file.
+            return_content (bool, optional): If True, the rendered page is
+                also kept in memory and returned. Defaults to False.
+
+        Returns:
+            tuple[str, str | None]: hash of the rendered page and, if requested,
+                the rendered page.
+        """
+        template = self._load_template(template_name)
+
+        start = time.perf_counter()
+        sha = hashlib.sha256()
+        chunks: list[str] | None = [] if return_content else None
+
+        # a unique name, so that jobs rendering the same page do not collide
+        f = tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(output_path) or ".",
+            prefix=f"{os.path.basename(output_path)}.",
+            suffix=".tmp",
+            delete=False,
+        )
+        temp_path = f.name
+        try:
+            with f:
+                for chunk in template.generate(**data):
+                    encoded = chunk.encode("utf-8")
+                    sha.update(encoded)
+                    f.write(encoded)
+                    if chunks is not None:
+                        chunks.append(chunk)
+            # temporary files are only readable by their owner
+            os.chmod(temp_path, 0o644)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        logging.info(
+            "Rendered file %s in %.2f ms.",
+            template_name,
+            (time.perf_counter() - start) * 1000,
+        )
+
+        content_hash = sha.hexdigest()
+        if content_hash == previous_hash:
+            os.remove(temp_path)
+            logging.info("%s is unchanged, not rewritten.", output_path)
+        else:
+            os.replace(temp_path, output_path)
+            logging.info("Saved rendered page to %s.", output_path)
+
+        return content_hash, "".join(chunks) if chunks is not None else None
+
+    @staticmethod
+    def _clean_data(data: dict | None) -> dict:
+        if data is None:
+            logging.debug("Rendering with no data.")
+            return {}
+
+        data_clean = {k: v for k, v in data.items() if v is not None}
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            # the data can hold thousands of repos, only a summary is logged
+            logging.debug("Rendering with data: %s", _data_repr.repr(data_clean))
+        return data_clean
 
     def renderFile(
         self,
         template_name: str,
         data: dict | None = None,
         output_path: str | None = None,
-    ) -> str:
+        return_content: bool = False,
+    ) -> str | None:
         """Render the template.
 
+        When an output path is given, the page is streamed to file and it is
+        only returned if requested. If a build manifest is configured and the
+        template, its data and the output file are unchanged since the last
+        render, rendering is skipped. An output whose content did not change is
+        not rewritten.
+
         Args:
             template_name (str): The name of the template
-            data (dict, optional): The data to render the template with. Defaults to None.
-            format (bool, optional): Auto format the rendered page. Defaults to True.
-        output_path (str, optional): The path to save the rendered page.
+            data (dict, optional): The data to render the template with.
                 Defaults to None.
+            output_path (str, optional): The path to save the rendered page.
+                Defaults to None.
+            return_content (bool, optional): If True, the rendered page is
+                returned even when it is saved to file. Defaults to False.
 
         Returns:
-            str: rendered page
+            str | None: rendered page, None if it was only saved to file.
         """
         logging.info("Rendering file %s ...", template_name)
-        template = self._environment.get_template(template_name)
-        template_path = self._settings.templates_path + template_name
-        logging.info("Template loaded from %s.", template_path)
+        data_clean = self._clean_data(data)
+
+        if not output_path:
+            return self._render(template_name, data_clean)
+
+        hashes = self._job_hashes(template_name, data_clean, output_path)
+        if self._is_unchanged(output_path, hashes):
+            logging.info("%s is unchanged, skipped rendering.", output_path)
+            if not return_content:
+                return None
+            with open(output_path, "r", encoding="utf-8") as f:
+                return f.read()
+
+        previous_hash = hashes["output"] if hashes else hash_file(output_path)
+        content_hash, content = self._stream(
+            template_name, data_clean, output_path, previous_hash, return_content
+        )
+
+        if hashes is not None:
+            self._record(output_path, hashes, content_hash)
+            self._manifest.save()  # type: ignore
+
+        return content
+
+    def render_batch(
+        self,
+        jobs: Iterable[tuple[str, dict | None, str]],
+        max_workers: int | None = None,
+    ) -> int:
+        """Render many pages, across a pool of processes.
+
+        Each worker process creates its own Renderer from the same settings, so
+        templates compiled here are loaded from the shared bytecode cache. Jobs
+        unchanged according to the build manifest are skipped before being sent
+        to the workers. A single job is rendered in this process.
+
+        Args:
+            jobs (Iterable[tuple[str, dict | None, str]]): template name, data and
+                output path of each page.
+            max_workers (int | None, optional): number of worker processes.
+                Defaults to None (max_workers setting, or the number of CPUs).
+
+        Returns:
+            int: number of rendered pages.
+
+        Raises:
+            ValueError: If two jobs have the same output path.
+        """
+        pending = []
+        outputs = set()
+        for template_name, data, output_path in jobs:
+            normalised = os.path.normpath(output_path)
+            if normalised in outputs:
+                raise ValueError(f"Several jobs render the page {output_path}")
+            outputs.add(normalised)
+
+            data_clean = self._clean_data(data)
+            hashes = self._job_hashes(template_name, data_clean, output_path)
+            if self._is_unchanged(output_path, hashes):
+                logging.info("%s is unchanged, skipped rendering.", output_path)
+                continue
+            pending.append((template_name, data_clean, output_path, hashes))
+
+        if max_workers is None:
+            max_workers = int(self._settings.get("max_workers", os.cpu_count() or 1))
+        max_workers = min(max_workers, len(pending))
+
+        logging.info(
+            "Rendering %d pages with %d workers", len(pending), max(max_workers, 1)
+        )
+
+        try:
+            if max_workers <= 1:
+                for template_name, data, output_path, hashes in pending:
+                    content_hash = _render_job(
+                        self, template_name, data, output_path, hashes
+                    )
+                    self._record(output_path, hashes, content_hash)
+            else:
+                self._render_parallel(pending, max_workers)
+        finally:
+            if self._manifest is not None:
+                self._manifest.save()
+
+        return len(pending)
+
+    def _render_parallel(self, pending: list[tuple], max_workers: int) -> None:
+        # compile the templates once, the workers load them from the bytecode cache
+        for template_name in {job[0] for job in pending}:
+            self._environment.get_template(template_name)
+
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(self._settings_path,),
+        )
+
+        try:
+            futures = {
+                executor.submit(
+                    _render_job, None, template_name, data, output_path, hashes
+                ): (output_path, hashes)
+                for template_name, data, output_path, hashes in pending
+            }
+            for future in as_completed(futures):
+                self._record(*futures[future], future.result())
+        finally:
+            # a failed job or an interrupt cancels the jobs not started yet,
+            # the running ones are waited for so no worker is left behind
+            executor.shutdown(cancel_futures=True)
+
+    def _record(self, output_path: str, hashes: dict | None, content_hash: str) -> None:
+        if hashes is not None:
+            self._manifest.update(  # type: ignore
+                output_path, **{**hashes, "output": content_hash}
+            )
+
+
+_worker_renderer: Renderer | None = None
 
-        if data is not None:
-            data_clean = {k: v for k, v in data.items() if v is not None}
-            logging.debug("Rendering with data: %s", data_clean)
-        else:
-            data_clean = {}
-            logging.debug("Rendering with no data.")
 
-        content = template.render(**data_clean)
-        logging.info("Rendered file %s.", template_name)
+def _init_worker(settings_path: str) -> None:
+    global _worker_renderer
+    _worker_renderer = Renderer(settings_path=settings_path, manifest=False)
 
-        if output_path:
-            logging.info("Saving rendered page to %s...", output_path)
-            with open(output_path, "w") as f:
-                f.write(content)  # type: ignore
-            logging.info("Saved.")
 
-        return content  # type: ignore
+def _render_job(
+    renderer: Renderer | None,
+    template_name: str,
+    data: dict,
+    output_path: str,
+    hashes: dict | None,
+) -> str:
+    # renders a page and saves it, in this process or in a worker
+    if renderer is None:
+        renderer = _worker_renderer
+    previous_hash = hashes["output"] if hashes else hash_file(output_path)
+    content_hash, _ = renderer._stream(  # type: ignore
+        template_name, data, output_path, previous_hash
+    )
+    return content_hash
@@ -3,16 +3,19 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any
+from typing import Any, Callable
 
 import ujson
 
 
 class Repository:
-    """Parsed GitHub repo class."""
+    """Parsed GitHub repo class.
 
-    _frozen: bool = False
-    _attributes = [
+    The object is immutable: attributes are validated once when it is created and
+    the derived values are computed on first access, then cached.
+    """
+
+    _attributes = (
         "name",
         "description",
         "html_url",
@@ -31,15 +34,35 @@ class Repository:
         "forks_count",
         "open_issues_count",
         "watchers",
-    ]
+    )
+
+    _time_attributes = tuple(filter(lambda x: x.endswith("_at"), _attributes))
+
+    # derived values are cached in a dict created on first access, so that repos
+    # whose derived values are never used do not pay for them
+    __slots__ = _attributes + ("_derived",)
+
+    def __init__(self, **kwargs: Any) -> None:
+        """Initialize the object.
 
-    _time_attributes = list(filter(lambda x: x.endswith("_at"), _attributes))
+        Args:
+            **kwargs (Any): Attributes of the repo. Unknown keys are ignored.
 
-    def __init__(self, **kwargs):
-        """Initialize the object."""
+        Raises:
+            TypeError: If a time attribute is not an ISO formatted string.
+        """
         for a in self._attributes:
-            self.__setattr__(a, kwargs.get(a))
-        self._frozen = True
+            object.__setattr__(self, a, kwargs.get(a))
+
+        for a in ("topics", "languages"):
+            if self.__getattribute__(a) is None:
+                object.__setattr__(self, a, [])
+
+        for a in self._time_attributes:
+            if not isinstance(self.__getattribute__(a), (str, type(None))):
+                raise TypeError(
+                    f"Attribute {a} of {self.__class__.__name__} must be a string"
+                )
 
     @classmethod
     def from_json(
@@ -58,68 +81,50 @@ class Repository:
         return cls(**json_data, languages=languages, commits_count=commits_count)
 
     def __setattr__(self, name: str, value: Any) -> None:
-        """Set the attribute of the object.
+        """Prevent the attributes of the object from being modified.
 
         Args:
             name (str)
-            value (_type_)
+            value (Any)
 
         Raises:
-            AttributeError: If the attribute cannot be modified.
+            AttributeError: Always, as the object is immutable.
         """
-        if name not in self._attributes:
-            return
+        raise AttributeError(
+            f"Attribute {name} cannot be modified in {self.__class__.__name__}"
+        )
 
-        if self._frozen:
-            raise AttributeError(
-                f"Attribute {name} cannot be modified in {self.__class__.__name__}"
-            )
+    def __getstate__(self) -> dict:
+        """Return the state of the object, used by pickle."""
+        return self.as_dict
 
-        super().__setattr__(name, value)
+    def __setstate__(self, state: dict) -> None:
+        """Restore the state of the object, used by pickle."""
+        self.__init__(**state)
 
-    def __getattr__(self, name: str) -> Any:
-        """Get the attribute of the object.
+    def _cached(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Return the value of a derived attribute, computing it on first access.
 
         Args:
-            name (str)
-
-        Raises:
-            AttributeError: If the attribute does not exist.
+            name (str): Name of the derived attribute.
+            factory (Callable[[], Any]): Function computing the value.
 
         Returns:
             Any
         """
-        if name in self._attributes:
-            return self.__getattribute__(name)
-
-        if (n := name.replace("_obj", "")) in self._time_attributes:
-            a = self.__getattribute__(n).replace("Z", "+00:00")
-            return datetime.fromisoformat(a)
+        try:
+            derived = object.__getattribute__(self, "_derived")
+        except AttributeError:
+            derived = {}
+            object.__setattr__(self, "_derived", derived)
 
-        if (n := name.replace("_formatted", "")) in self._time_attributes:
-            a = self.__getattribute__(n).replace("Z", "+00:00")
-            return datetime.fromisoformat(a).strftime("%Y-%m-%d")
+        if name not in derived:
+            derived[name] = factory()
+        return derived[name]
 
-        if name == "language":
-            if len(self.languages) == 0:
-                return None
-            return self.languages[0]["language"]
-
-        if name == "name_formatted":
-            return self.name.replace("-", " ").lower()
-
-        if name == "description_formatted":
-            description = self.description[0].upper() + self.description[1:]
-            if description.endswith("."):
-                return description[:-1]
-            return description
-
-        if name == "languages_set":
-            return set([lang["language"] for lang in self.languages])
-
-        raise AttributeError(
-            f"Attribute {name} does not exist in {self.__class__.__name__}"
-        )
+    @staticmethod
+    def _parse_time(value: str) -> datetime:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
 
     def __repr__(self) -> str:
         """Return the representation of the object."""
@@ -146,3 +151,74 @@ class Repository:
     def is_interactive(self) -> bool:
         """Return True if the repo is interactive."""
         return self.homepage != "" and self.homepage is not None
+
+    @property
+    def created_at_obj(self) -> datetime:
+        """Return the creation time as a datetime."""
+        return self._cached("created_at_obj", lambda: self._parse_time(self.created_at))
+
+    @property
+    def updated_at_obj(self) -> datetime:
+        """Return the last update time as a datetime."""
+        return self._cached("updated_at_obj", lambda: self._parse_time(self.updated_at))
+
+    @property
+    def pushed_at_obj(self) -> datetime:
+        """Return the last push time as a datetime."""
+        return self._cached("pushed_at_obj", lambda: self._parse_time(self.pushed_at))
+
+    @property
+    def created_at_formatted(self) -> str:
+        """Return the creation date, formatted as YYYY-MM-DD."""
+        return self._cached(
+            "created_at_formatted", lambda: self.created_at_obj.strftime("%Y-%m-%d")
+        )
+
+    @property
+    def updated_at_formatted(self) -> str:
+        """Return the last update date, formatted as YYYY-MM-DD."""
+        return self._cached(
+            "updated_at_formatted", lambda: self.updated_at_obj.strftime("%Y-%m-%d")
+        )
+
+    @property
+    def pushed_at_formatted(self) -> str:
+        """Return the last push date, formatted as YYYY-MM-DD."""
+        return self._cached(
+            "pushed_at_formatted", lambda: self.pushed_at_obj.strftime("%Y-%m-%d")
+        )
+
+    @property
+    def language(self) -> str | None:
+        """Return the main language of the repo, None if it has no languages."""
+        return self._cached(
+            "language",
+            lambda: self.languages[0]["language"] if self.languages else None,
+        )
+
+    @property
+    def name_formatted(self) -> str:
+        """Return the name of the repo, formatted for the homepage."""
+        return self._cached(
+            "name_formatted", lambda: self.name.replace("-", " ").lower()
+        )
+
+    @property
+    def description_formatted(self) -> str:
+        """Return the description of the repo, formatted for the homepage."""
+
+        def format_description() -> str:
+            description = self.description[0].upper() + self.description[1:]
+            if description.endswith("."):
+                return description[:-1]
+            return description
+
+        return self._cached("description_formatted", format_description)
+
+    @property
+    def languages_set(self) -> frozenset[str]:
+        """Return the set of languages used in the repo."""
+        return self._cached(
+            "languages_set",
+            lambda: frozenset(lang["language"] for lang in self.languages),
+        )
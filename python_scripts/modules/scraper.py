@@ -3,18 +3,29 @@
 from __future__ import annotations
 
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any
 
 import ujson
 
+from modules.cache import ResponseCache
 from modules.github import GitHub, Repository
+from modules.ratelimit import RateLimiter
 from modules.settings import Settings
+from modules.snapshot import SnapshotRepos, is_snapshot, write_snapshot
+from modules.stats import StatsEngine
+from modules.storage import read_repos, write_repos
+
+SNAPSHOT_EXTENSION = ".snap"
 
 
 class Scraper(GitHub):
     """Scraper class."""
 
-    _repos: list[Repository]
+    __repos: list[Repository]
+    _indexes: dict[str, Any] | None = None
+    _repos_stats: dict[str, Any] | None = None
+    _update_stats: dict[str, int] | None = None
     _settings: Settings
     _settings_path: str
 
@@ -22,7 +33,33 @@ class Scraper(GitHub):
         """Create a new Scraper instance."""
         logging.info("Initializing %s...", self.__class__.__name__)
         self._settings = Settings.from_toml(settings_path, self.__class__.__name__)
-        super().__init__(self._settings.username, self._settings.token)
+        super().__init__(
+            self._settings.username,
+            self._settings.token,
+            pool_size=int(self._settings.get("pool_size", self.max_workers)),
+            timeout=float(self._settings.get("timeout", 10.0)),
+            cache=self._create_cache(),
+            graphql_url=self._settings.get(
+                "graphql_url", "https://api.github.com/graphql"
+            ),
+            rate_limiter=RateLimiter(
+                max_retries=int(self._settings.get("max_retries", 5)),
+                backoff_base=float(self._settings.get("backoff_base", 1.0)),
+                backoff_max=float(self._settings.get("backoff_max", 60.0)),
+                reserve=int(self._settings.get("rate_limit_reserve", 10)),
+            ),
+        )
+
+    def _create_cache(self) -> ResponseCache | None:
+        cache_path = self._settings.get("cache_path", "")
+        if not cache_path:
+            return None
+
+        return ResponseCache(
+            cache_path,
+            max_age=float(self._settings.get("cache_max_age", 7 * 24 * 60 * 60)),
+            max_size=int(self._settings.get("cache_max_size", 50 * 1024 * 1024)),
+        )
 
     def scrape_repos(self, skip_private: bool = True) -> int | None:
         """Scrape the repos.
@@ -35,12 +72,13 @@ class Scraper(GitHub):
             int: _description_
         """
         logging.info("Loading repos...")
-        repos = []
-        repo_names = self.get_repos_names(skip_private=skip_private)
 
         try:
-            for repo_name in repo_names:
-                repos.append(self.get_repo_by_name(repo_name))
+            if self.backend == "graphql":
+                repos = self.get_repos_graphql(skip_private=skip_private)
+            else:
+                listing = self.get_repos_listing(skip_private=skip_private)
+                repos = self._fetch_repos(listing)
         except KeyboardInterrupt:
             logging.info("KeyboardInterrupt, exiting...")
             return None
@@ -50,6 +88,107 @@ class Scraper(GitHub):
         logging.info("Loaded %s repos", len(self._repos))
         return len(self._repos)
 
+    def update_repos(
+        self, path: str = "repos.jsonl", skip_private: bool = True
+    ) -> int | None:
+        """Update the repos saved in a file, only fetching the changed ones.
+
+        The saved repos are compared with the repos listing by id, updated_at
+        and pushed_at. Languages and commits are only fetched for the new and
+        changed repos, while the deleted repos are dropped. If the file does not
+        exist, all the repos are scraped.
+
+        Args:
+            path (str, optional): file path. Defaults to "repos.jsonl".
+            skip_private (bool, optional): if true, private repos are skipped.
+                Defaults to True.
+
+        Returns:
+            int | None: number of loaded repos, None if interrupted.
+        """
+        if self.backend == "graphql":
+            logging.info("GraphQL backend in use, scraping all the repos")
+            return self.scrape_repos(skip_private=skip_private)
+
+        try:
+            self.load_repos(path)
+        except FileNotFoundError:
+            logging.info("No repos saved in %s, scraping all the repos", path)
+            return self.scrape_repos(skip_private=skip_private)
+
+        logging.info("Updating repos...")
+        previous = {r.id: r for r in self._repos}
+
+        try:
+            listing = self.get_repos_listing(skip_private=skip_private)
+            changed = [
+                json_data
+                for json_data in listing
+                if json_data["id"] not in previous
+                or previous[json_data["id"]].updated_at != json_data["updated_at"]
+                or previous[json_data["id"]].pushed_at != json_data["pushed_at"]
+            ]
+            fetched = {r.id: r for r in self._fetch_repos(changed)}
+        except KeyboardInterrupt:
+            logging.info("KeyboardInterrupt, exiting...")
+            return None
+
+        repos = []
+        for json_data in listing:
+            if json_data["id"] in fetched:
+                repos.append(fetched[json_data["id"]])
+            else:
+                # the listing payload is fresh, languages and commits are reused
+                old = previous[json_data["id"]]
+                repos.append(
+                    Repository.from_json(
+                        json_data,
+                        languages=old.languages,
+                        commits_count=old.commits_count,
+                    )
+                )
+
+        self._repos = sorted(repos, key=lambda x: x.created_at)
+
+        listed_ids = {json_data["id"] for json_data in listing}
+        added = sum(1 for json_data in changed if json_data["id"] not in previous)
+        self._update_stats = {
+            "reused": len(listing) - len(changed),
+            "refreshed": len(changed) - added,
+            "added": added,
+            "removed": sum(1 for repo_id in previous if repo_id not in listed_ids),
+        }
+
+        logging.info(
+            "Updated repos: %(reused)d reused, %(refreshed)d refreshed, "
+            "%(added)d added, %(removed)d removed",
+            self._update_stats,
+        )
+        return len(self._repos)
+
+    def _fetch_repos(self, listing: list[dict]) -> list[Repository]:
+        logging.info("Fetching repos with %d workers", self.max_workers)
+        repos = []
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        try:
+            futures = [
+                executor.submit(self.get_repo_from_listing, json_data)
+                for json_data in listing
+            ]
+            for future in as_completed(futures):
+                repos.append(future.result())
+        except BaseException:
+            # a failed fetch or an interrupt cancels the requests not sent yet
+            # and wakes the ones waiting in the limiter, then the running ones
+            # are waited for, so none is left using the session once it closes
+            self._rate_limiter.stop()
+            executor.shutdown(cancel_futures=True)
+            raise
+
+        executor.shutdown()
+        return repos
+
     def save_stats(self, path: str = "stats.json") -> None:
         """Save stats to file.
 
@@ -61,30 +200,37 @@ class Scraper(GitHub):
             ujson.dump(self.stats, f)
         logging.info("Saved stats")
 
-    def save_repos(self, path: str = "repos.json") -> None:
+    def save_repos(self, path: str = "repos.jsonl") -> None:
         """Save repos list to file.
 
+        Paths ending in .snap are saved as binary snapshots, any other path as
+        JSON Lines.
+
         Args:
             path (str, optional): file path. Defaults to value from settings.
         """
         logging.info("Saving repos to %s", path)
-        with open(path, "w") as f:
-            dicts = {"Repositories": [r.as_dict for r in self._repos]}
-            ujson.dump(dicts, f)  # type: ignore
-        logging.info("Saved %s repos", len(self._repos))
+        if path.endswith(SNAPSHOT_EXTENSION):
+            count = write_snapshot(path, self._repos)
+        else:
+            count = write_repos(path, self._repos)
+        logging.info("Saved %s repos", count)
 
-    def load_repos(self, path: str = "repos.json") -> None:
+    def load_repos(self, path: str = "repos.jsonl") -> None:
         """Load repos list from file.
 
+        Binary snapshots are decoded one column at a time. The build uses every
+        repo, so they are all created up front rather than on first access.
+
         Args:
             path (str, optional): file path. Defaults to value from settings.
         """
         logging.info("Loading repos from %s", path)
-        with open(path, "r") as f:
-            data = ujson.load(f)
-            self._repos = [
-                Repository(**repo_dict) for repo_dict in data["Repositories"]
-            ]
+        if is_snapshot(path):
+            with SnapshotRepos(path) as snapshot:
+                self._repos = snapshot.materialise()
+        else:
+            self._repos = list(read_repos(path))
         logging.info("Loaded %s repos", len(self._repos))
 
     def repos_by_language(self, language: str) -> set[Repository]:
@@ -96,33 +242,96 @@ class Scraper(GitHub):
         Returns:
             set[Repo]: set of repos
         """
-        return set(
-            filter(
-                lambda x: x.language == language,
-                self.interesting_repos,
-            )
-        )
+        return set(self._get_indexes()["by_language"].get(language, []))
+
+    def repos_by_topic(self, topic: str) -> list[Repository]:
+        """Get the list of repos with a set topic, sorted by creation date.
+
+        Args:
+            topic (str): topic name
 
-    def _get_languages_stat(self) -> dict[str, dict]:
-        languages = dict()
+        Returns:
+            list[Repo]: list of repos
+        """
+        return self._get_indexes()["by_topic"].get(topic, [])
 
-        for repo in self._repos:
-            for language in repo.languages:
-                name = language["language"]
-                if name not in languages:
-                    languages[name] = {"size": 0, "repos": 0}
+    def _get_indexes(self) -> dict[str, Any]:
+        if self._indexes is None:
+            self._indexes = self._build_indexes()
+        return self._indexes
 
-                languages[name]["size"] += language["size"]
-                languages[name]["repos"] += 1
+    def _build_indexes(self) -> dict[str, Any]:
+        """Group the repos by language and topic in a single pass.
 
-        total_size = sum(lang["size"] for lang in languages.values())
+        Returns:
+            dict[str, Any]: indexes of the repos
+        """
+        relevant_topics = set(self._settings.relevant_topics)
+        skip_topics = set(self._settings.skip_interactive_topics)
+        skip_names = set(self._settings.skip_interactive_names)
+
+        languages = set()
+        interesting = []
+        interactive = []
+        by_language = {}
+        by_topic = {}
+
+        for r in sorted(self._repos, key=lambda x: x.created_at):
+            if r.language:
+                languages.add(r.language)
+            for t in r.topics:
+                by_topic.setdefault(t, []).append(r)
+
+            if relevant_topics.isdisjoint(r.topics):
+                continue
+
+            interesting.append(r)
+            by_language.setdefault(r.language, []).append(r)
+            if (
+                r.is_interactive
+                and skip_topics.isdisjoint(r.topics)
+                and r.name not in skip_names
+            ):
+                interactive.append(r)
+
+        def newest_first(repos: list[Repository]) -> list[Repository]:
+            # a stable sort, unlike reversing, keeps repos created at the same
+            # time in their original order
+            return sorted(repos, key=lambda x: x.created_at, reverse=True)
+
+        languages = sorted(languages)
+        return {
+            "languages": languages,
+            "interesting": interesting,
+            "interactive": newest_first(interactive),
+            "by_language": by_language,
+            "by_topic": by_topic,
+            "repos_list": {
+                lang: newest_first(by_language[lang])
+                for lang in languages
+                if lang in by_language
+            },
+        }
 
-        for language in languages.values():
-            relative_size = language["size"] / total_size
-            language["relative_size"] = relative_size
-            language["relative_size_formatted"] = f"{relative_size:.2%}"
+    @property
+    def backend(self) -> str:
+        """Get the backend used to scrape the repos, "rest" or "graphql"."""
+        return self._settings.get("backend", "rest")
 
-        return languages
+    @property
+    def max_workers(self) -> int:
+        """Get the number of repos fetched concurrently."""
+        return int(self._settings.get("max_workers", 8))
+
+    @property
+    def _repos(self) -> list[Repository]:
+        return self.__repos
+
+    @_repos.setter
+    def _repos(self, repos: list[Repository]) -> None:
+        self.__repos = repos
+        self._indexes = None
+        self._repos_stats = None
 
     @property
     def repos(self) -> list[Repository]:
@@ -132,48 +341,22 @@ class Scraper(GitHub):
     @property
     def interesting_repos(self) -> list[Repository]:
         """Get the list of interesting repos."""
-        return sorted(
-            [
-                r
-                for r in self._repos
-                if any(t in r.topics for t in self._settings.relevant_topics)
-            ],
-            key=lambda x: x.created_at,
-        )
+        return self._get_indexes()["interesting"]
 
     @property
     def languages(self) -> list[str]:
         """Get the list of languages used in all the repositories."""
-        languages = set(repo.language for repo in self._repos if repo.language)
-        return sorted(languages)
+        return self._get_indexes()["languages"]
 
     @property
     def interactive_repos(self) -> list[Repository]:
         """Get the list of interactive repos."""
-        repos = [
-            r
-            for r in self.interesting_repos
-            if r.is_interactive
-            and all(t not in r.topics for t in self._settings.skip_interactive_topics)
-            and r.name not in self._settings.skip_interactive_names
-        ]
-        return sorted(repos, key=lambda x: x.created_at, reverse=True)
+        return self._get_indexes()["interactive"]
 
     @property
     def repos_list(self) -> dict[str, list[Repository]]:
         """Get the list of repos grouped by language."""
-        repos = {}
-
-        for lang in self.languages:
-            lang_repos = sorted(
-                self.repos_by_language(lang),
-                key=lambda x: x.created_at,
-                reverse=True,
-            )
-            if lang_repos:
-                repos[lang] = lang_repos
-
-        return repos
+        return self._get_indexes()["repos_list"]
 
     @property
     def stats(self) -> dict[str, Any]:
@@ -182,12 +365,14 @@ class Scraper(GitHub):
         stats["total_repos"] = len(self._repos)
         stats["interesting_repos"] = len(self.interesting_repos)
         stats["interactive_repos"] = len(self.interactive_repos)
-        stats["languages"] = self._get_languages_stat()
-        stats["stargazers_count"] = sum(r.stargazers_count for r in self._repos)
-        stats["forks_count"] = sum(r.forks_count for r in self._repos)
-        stats["watchers_count"] = sum(r.watchers_count for r in self._repos)
-        stats["open_issues_count"] = sum(r.open_issues_count for r in self._repos)
-        stats["commits_count"] = sum(r.commits_count for r in self._repos)
+        # languages, counter totals, years, topics and stargazer percentiles
+        if self._repos_stats is None:
+            self._repos_stats = StatsEngine(self._repos).compute()
+        stats.update(self._repos_stats)
+
         stats["github_requests_count"] = self.requests_count
+        stats["github_cache"] = self.cache_stats
+        stats["github_rate_limit"] = self.rate_limit_stats
+        stats["update"] = self._update_stats
 
         return stats
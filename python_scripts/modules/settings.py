@@ -27,25 +27,48 @@ class Settings:
 
         raise AttributeError(f"{self.__class__.__name__} has no attribute {name}")
 
+    def get(self, name: str, default: Any = None) -> Any:
+        """Get a setting, falling back to a default value if it is missing.
+
+        Args:
+            name (str): Setting name.
+            default (Any, optional): Value returned if the setting is missing.
+                Defaults to None.
+
+        Returns:
+            Any: Setting value.
+        """
+        return self._settings.get(name, default)
+
     @staticmethod
-    def from_toml(path: str, section: str | None = None) -> Settings:
+    def from_toml(
+        path: str, section: str | None = None, defaults: dict | None = None
+    ) -> Settings:
         """Create a new Settings instance from a TOML file.
 
         Args:
             path (str): Path to the TOML file.
             section (str, optional): Section to load. If None, loads the whole file.
                 Defaults to None.
+            defaults (dict, optional): Values of the settings missing from the
+                file. If set, a missing section is loaded as empty instead of
+                raising an error. Defaults to None.
 
         Returns:
             Settings: Settings instance.
+
+        Raises:
+            ValueError: If the section is not in the file and there are no defaults.
         """
         with open(path, "r") as f:
             settings = toml.load(f)
 
         if section is not None:
-            if section not in settings:
+            if section in settings:
+                settings = settings[section]
+            elif defaults is not None:
+                settings = {}
+            else:
                 raise ValueError(f"Section {section} not found in {path}")
 
-            settings = settings[section]
-
-        return Settings(**settings)
+        return Settings(**{**(defaults or {}), **settings})
@@ -0,0 +1,203 @@
+"""Statistics engine, computing all the aggregates of the repos in a single pass."""
+
+from __future__ import annotations
+
+from operator import attrgetter
+from typing import Any, Callable, Iterable
+
+from modules.repository import Repository
+
+_fields = attrgetter(
+    "stargazers_count",
+    "commits_count",
+    "forks_count",
+    "watchers_count",
+    "open_issues_count",
+    "topics",
+    "created_at",
+    "languages",
+)
+
+
+class StatsEngine:
+    """Computes the aggregate statistics of a list of repos.
+
+    A single loop over the repos fills the accumulators: the totals of the
+    counters, the size and number of repos of each language, the repo, commit
+    and star totals of each creation year and of each topic, and the
+    stargazers column. Aggregates are computed from these accumulators, so new
+    ones can be registered with StatsEngine.aggregate without another pass
+    over the repo objects.
+    """
+
+    _aggregates: dict[str, Callable[[StatsEngine], Any]] = {}
+
+    def __init__(self, repos: Iterable[Repository]) -> None:
+        """Create a new StatsEngine instance, filling the accumulators.
+
+        Args:
+            repos (Iterable[Repository]): repos to compute the statistics of.
+        """
+        # [size, repos] of each language, in order of first use
+        self.languages: dict[str, list[int]] = {}
+        # [repos, commits, stars] of each year (as written in the dates) and topic
+        self.years: dict[str, list[int]] = {}
+        self.topics: dict[str, list[int]] = {}
+        self.stargazers: list[int] = []
+
+        commits = forks = watchers = open_issues = 0
+        languages = self.languages
+        years = self.years
+        topics = self.topics
+        add_stargazers = self.stargazers.append
+        for (
+            repo_stars,
+            repo_commits,
+            repo_forks,
+            repo_watchers,
+            repo_open_issues,
+            repo_topics,
+            created_at,
+            repo_languages,
+        ) in map(_fields, repos):
+            add_stargazers(repo_stars)
+            commits += repo_commits
+            forks += repo_forks
+            watchers += repo_watchers
+            open_issues += repo_open_issues
+
+            for language in repo_languages:
+                name = language["language"]
+                totals = languages.get(name)
+                if totals is None:
+                    languages[name] = [language["size"], 1]
+                else:
+                    totals[0] += language["size"]
+                    totals[1] += 1
+
+            year = created_at[:4]
+            totals = years.get(year)
+            if totals is None:
+                years[year] = [1, repo_commits, repo_stars]
+            else:
+                totals[0] += 1
+                totals[1] += repo_commits
+                totals[2] += repo_stars
+
+            for topic in repo_topics:
+                totals = topics.get(topic)
+                if totals is None:
+                    topics[topic] = [1, repo_commits, repo_stars]
+                else:
+                    totals[0] += 1
+                    totals[1] += repo_commits
+                    totals[2] += repo_stars
+
+        self.rows = len(self.stargazers)
+        self.totals = {
+            "stargazers_count": sum(self.stargazers),
+            "forks_count": forks,
+            "watchers_count": watchers,
+            "open_issues_count": open_issues,
+            "commits_count": commits,
+        }
+
+    @classmethod
+    def aggregate(
+        cls, name: str
+    ) -> Callable[[Callable[[StatsEngine], Any]], Callable[[StatsEngine], Any]]:
+        """Register a new aggregate, computed from the accumulators.
+
+        Args:
+            name (str): key of the aggregate in the statistics.
+
+        Returns:
+            Callable: decorator registering the aggregate function.
+        """
+
+        def decorator(
+            function: Callable[[StatsEngine], Any],
+        ) -> Callable[[StatsEngine], Any]:
+            cls._aggregates[name] = function
+            return function
+
+        return decorator
+
+    def compute(self, names: Iterable[str] | None = None) -> dict[str, Any]:
+        """Compute the registered aggregates.
+
+        Args:
+            names (Iterable[str] | None, optional): aggregates to compute.
+                Defaults to None (all the aggregates).
+
+        Returns:
+            dict[str, Any]: statistics, keyed by aggregate name.
+        """
+        if names is None:
+            names = self._aggregates.keys()
+
+        return {name: self._aggregates[name](self) for name in names}
+
+
+def _totals(accumulators: dict) -> dict:
+    return {
+        key: {
+            "repos": repos,
+            "commits_count": commits,
+            "stargazers_count": stars,
+        }
+        for key, (repos, commits, stars) in sorted(accumulators.items())
+    }
+
+
+@StatsEngine.aggregate("languages")
+def _languages(engine: StatsEngine) -> dict[str, dict]:
+    total_size = sum(size for size, _ in engine.languages.values())
+
+    languages = {}
+    for name, (size, repos) in engine.languages.items():
+        relative_size = size / total_size
+        languages[name] = {
+            "size": size,
+            "repos": repos,
+            "relative_size": relative_size,
+            "relative_size_formatted": f"{relative_size:.2%}",
+        }
+    return languages
+
+
+def _register_total(name: str) -> None:
+    StatsEngine.aggregate(name)(lambda engine: engine.totals[name])
+
+
+for _name in (
+    "stargazers_count",
+    "forks_count",
+    "watchers_count",
+    "open_issues_count",
+    "commits_count",
+):
+    _register_total(_name)
+
+
+@StatsEngine.aggregate("years")
+def _years(engine: StatsEngine) -> dict[int, dict[str, int]]:
+    return _totals({int(year): totals for year, totals in engine.years.items()})
+
+
+@StatsEngine.aggregate("topics")
+def _topics(engine: StatsEngine) -> dict[str, dict[str, int]]:
+    return _totals(engine.topics)
+
+
+@StatsEngine.aggregate("stargazers_percentiles")
+def _stargazers_percentiles(engine: StatsEngine) -> dict[str, int]:
+    stars = sorted(engine.stargazers)
+    if not stars:
+        return {}
+
+    def percentile(p: int) -> int:
+        # nearest-rank percentile
+        return stars[max(0, -(-p * len(stars) // 100) - 1)]
+
+    return {f"p{p}": percentile(p) for p in (50, 90, 99, 100)}
@@ -0,0 +1,87 @@
+"""Streaming reader and writer of the repos files."""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Iterable, Iterator
+
+import ujson
+
+from modules.repository import Repository
+
+SCHEMA_VERSION = 1
+
+
+def write_repos(path: str, repos: Iterable[Repository]) -> int:
+    """Write repos to file, one at a time.
+
+    The file is in JSON Lines format: the first line is a header carrying the
+    schema version, followed by one line per repo. The file is written to a
+    temporary path and then moved in place.
+
+    Args:
+        path (str): file path.
+        repos (Iterable[Repository]): repos to write.
+
+    Returns:
+        int: number of written repos.
+    """
+    count = 0
+    temp_path = f"{path}.tmp"
+
+    with open(temp_path, "w") as f:
+        f.write(ujson.dumps({"schema_version": SCHEMA_VERSION}))
+        f.write("\n")
+        for repo in repos:
+            f.write(ujson.dumps(repo.as_dict))
+            f.write("\n")
+            count += 1
+
+    os.replace(temp_path, path)
+    return count
+
+
+def read_repos(path: str) -> Iterator[Repository]:
+    """Read repos from file, one at a time.
+
+    Both the JSON Lines format and the previous format, a single JSON object
+    holding the list of repos, are supported. A file whose first line is not a
+    header record is read whole, in the previous format.
+
+    Args:
+        path (str): file path.
+
+    Yields:
+        Repository: the repos in the file.
+
+    Raises:
+        ValueError: If the file schema version is not supported, or the file
+            is in neither format.
+    """
+    with open(path, "r") as f:
+        try:
+            header = ujson.loads(f.readline())
+        except ValueError:
+            # the previous format, indented or edited by hand
+            header = None
+
+        if not isinstance(header, dict) or "schema_version" not in header:
+            logging.info("Reading repos from legacy file %s", path)
+            f.seek(0)
+            data = ujson.load(f)
+            if not isinstance(data, dict) or "Repositories" not in data:
+                raise ValueError(f"{path} is not a repos file")
+
+            for repo_dict in data["Repositories"]:
+                yield Repository(**repo_dict)
+            return
+
+        if header["schema_version"] > SCHEMA_VERSION:
+            raise ValueError(
+                f"Unsupported schema version {header['schema_version']} in {path}"
+            )
+
+        for line in f:
+            if line.strip():
+                yield Repository(**ujson.loads(line))